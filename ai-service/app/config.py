@@ -4,8 +4,44 @@ from functools import lru_cache
 
 class Settings(BaseSettings):
     openai_api_key: str = ""
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 20
+    llm_timeout_seconds: float = 60.0
+    summary_model: str = "gpt-4o-mini"  # map-reduce compression of over-budget prompt inputs
+    summary_chunk_tokens: int = 2000
+    summary_concurrency: int = 4
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "./llm_cache/responses.sqlite3"
+    llm_cache_size: int = 1024  # in-memory entries; 0 keeps only SQLite
+    llm_cache_ttl_seconds: float = 7 * 24 * 3600  # 0 = never expire
+    llm_cache_max_rows: int = 100_000  # SQLite rows kept, newest first; 0 = unbounded
     tavily_api_key: str = ""
     chroma_persist_dir: str = "./chroma_db"
+    persist_embeddings: bool = True
+    vector_precision: str = "float32"  # float32, float16 or int8 for new collections
+    ann_auto_build_rows: int = 100000  # 0 disables automatic IVF builds
+    query_cache_size: int = 1024  # 0 disables the embeddings query cache
+    query_cache_ttl_seconds: float = 300.0
+    content_source_concurrency: int = 4
+    content_source_timeout_seconds: float = 30.0
+    http_cache_dir: str = "./http_cache"
+    http_cache_fresh_seconds: float = 3600.0  # when the server sends no max-age
+    http_max_connections: int = 50
+    http_per_host_connections: int = 4
+    http_timeout_seconds: float = 10.0
+    pdf_workers: int = 0  # 0 = one per CPU
+    pdf_timeout_seconds: float = 30.0
+    pdf_max_pages: int = 200
+    pdf_max_bytes: int = 20 * 1024 * 1024
+    extraction_cache_dir: str = "./extraction_cache"
+    extraction_cache_size: int = 256  # in-memory entries; 0 keeps only the disk tier
+    youtube_workers: int = 4
+    youtube_timeout_seconds: float = 15.0
+    transcript_cache_dir: str = "./transcript_cache"
+    transcript_cache_ttl_seconds: float = 7 * 24 * 3600
+    resume_batch_max_files: int = 500
+    resume_batch_llm_concurrency: int = 8
+    skill_taxonomy_path: str = ""  # empty = bundled app/data/skill_taxonomy.json
     log_level: str = "INFO"
     
     class Config:
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -5,13 +7,34 @@ from dotenv import load_dotenv
 
 from app.routers import skill_gap, assessment, aptitude, embeddings, orchestration
 from app.config import settings
+from app.tools.http_fetcher import close_http_fetcher, get_http_fetcher
+from app.tools.llm_cache import close_llm_cache
+from app.tools.llm_registry import close_llm_registry, get_llm_registry
+from app.tools.pdf_extractor import get_pdf_extractor, shutdown_pdf_extractor
+from app.tools.single_flight import single_flight_stats
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client for all scraping, one for all LLM calls and
+    # one warm process pool for PDF parsing, all released on shutdown
+    get_http_fetcher()
+    get_llm_registry()
+    await get_pdf_extractor().start()
+    yield
+    await close_http_fetcher()
+    await close_llm_registry()
+    close_llm_cache()
+    shutdown_pdf_extractor()
+
+
 app = FastAPI(
     title="AI Automation Platform - AI Service",
     description="Python AI backend with LangChain agents for skill analysis, assessment generation, and aptitude testing",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -36,6 +59,12 @@ async def health_check():
     return {"status": "ok", "service": "ai-service"}
 
 
+@app.get("/metrics/coalescing")
+async def coalescing_metrics():
+    """Per call type: calls made, calls executed and calls collapsed into an in-flight one."""
+    return single_flight_stats()
+
+
 @app.get("/")
 async def root():
     return {
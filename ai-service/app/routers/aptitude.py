@@ -3,7 +3,6 @@ from typing import List
 import uuid
 import random
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.models import (
@@ -14,7 +13,7 @@ from app.models import (
     EvaluateResponseRequest,
     AnalyzeSessionRequest,
 )
-from app.config import settings
+from app.tools.llm_registry import get_llm
 
 router = APIRouter()
 
@@ -86,11 +85,7 @@ async def evaluate_response(request: EvaluateResponseRequest):
     Evaluate a candidate's response using LLM.
     """
     try:
-        llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.3,
-            api_key=settings.openai_api_key
-        )
+        llm = get_llm("gpt-4o", 0.3, "aptitude_evaluation")
         
         eval_prompt = ChatPromptTemplate.from_template("""
 You are an expert technical interviewer evaluating a candidate's response.
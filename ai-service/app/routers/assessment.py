@@ -1,22 +1,39 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from pydantic import TypeAdapter, ValidationError
+from typing import Any, AsyncIterator, List, Literal, Optional, Tuple
 import uuid
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.models import (
     AssessmentRequest,
     AssessmentResponse,
+    ContentSource,
     Quest,
     QuizQuestion,
     CodingChallenge,
 )
-from app.config import settings
-from app.tools.content_processor import process_content_sources
+from app.tools.llm_registry import get_llm
+from app.tools.content_processor import (
+    SourceInput,
+    iter_content_sources,
+    join_source_texts,
+    process_content_sources,
+)
+from app.tools.event_stream import EventFormat, event_stream_response
+from app.tools.prompt_budget import PromptBudget
+from app.tools.uploads import spool_pdf_upload
 
 router = APIRouter()
 
+# Characters kept from each content source; PDFs stop parsing once they have them
+CONTENT_SOURCE_CHARS = 40000
+# Token budget of the generation prompt; longer content is condensed, not cut off
+CONTENT_PROMPT_TOKENS = 3000
+CONTENT_SUMMARY_FOCUS = "Keep the key concepts, definitions, examples and facts a quiz could test."
+
+Difficulty = Literal["beginner", "intermediate", "advanced"]
+
 
 @router.post("/generate", response_model=AssessmentResponse)
 async def generate_assessment(request: AssessmentRequest):
@@ -28,17 +45,104 @@ async def generate_assessment(request: AssessmentRequest):
     """
     try:
         # Process content sources (PDF, YouTube, URLs)
-        content_text = await process_content_sources(request.content_sources)
-        
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model="gpt-4-turbo-preview",
-            temperature=0.5,
-            api_key=settings.openai_api_key
+        content_text = await process_content_sources(
+            request.content_sources, max_chars=CONTENT_SOURCE_CHARS
         )
         
-        # Generate assessment content
-        assessment_prompt = ChatPromptTemplate.from_template("""
+        return await build_assessment(content_text, request.difficulty)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate/stream")
+async def generate_assessment_stream(
+    request: AssessmentRequest,
+    stream_format: EventFormat = Query("sse", alias="format"),
+    tokens: bool = Query(True, description="Stream the LLM's draft as it is generated"),
+):
+    """
+    Streaming variant of /generate. Emits ``started`` immediately, one
+    ``source`` per content source as it finishes loading, ``token`` (the
+    LLM draft, if ``tokens``), one ``quest`` per quest, and ``complete``
+    with the full AssessmentResponse. Sent as server-sent events, or
+    NDJSON with ``format=ndjson``.
+    """
+
+    async def events() -> AsyncIterator[Tuple[str, Any]]:
+        yield "started", {"sources": len(request.content_sources)}
+        results = []
+        async for result in iter_content_sources(request.content_sources, max_chars=CONTENT_SOURCE_CHARS):
+            results.append(result)
+            yield "source", {
+                "index": result.index,
+                "type": result.type,
+                "chars": len(result.text or ""),
+                "error": result.error,
+                "details": result.details,
+                "elapsed_ms": result.elapsed_ms,
+            }
+        
+        content_text = join_source_texts(results)
+        async for event in iter_assessment(content_text, request.difficulty, stream_tokens=tokens):
+            yield event
+
+    return event_stream_response(events(), stream_format)
+
+
+@router.post("/generate/upload", response_model=AssessmentResponse)
+async def generate_assessment_upload(
+    files: List[UploadFile] = File(default=[], description="PDF content sources"),
+    content_sources: Optional[str] = Form(None, description="Other ContentSource objects as a JSON list"),
+    difficulty: Difficulty = Form("intermediate"),
+):
+    """
+    Multipart variant of /generate: PDFs are sent as file parts rather than
+    base64 ``data`` fields. Uploaded files come first in source order,
+    followed by ``content_sources``.
+    """
+    try:
+        sources: List[SourceInput] = [await spool_pdf_upload(upload) for upload in files]
+        if content_sources:
+            sources += TypeAdapter(List[ContentSource]).validate_json(content_sources)
+
+        content_text = await process_content_sources(sources, max_chars=CONTENT_SOURCE_CHARS)
+        
+        return await build_assessment(content_text, difficulty)
+        
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid content_sources: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for upload in files:
+            await upload.close()
+
+
+async def build_assessment(content_text: str, difficulty: str) -> AssessmentResponse:
+    """Generate the assessment module for already-extracted content."""
+    async for event, payload in iter_assessment(content_text, difficulty):
+        if event == "complete":
+            return payload
+
+
+async def iter_assessment(
+    content_text: str,
+    difficulty: str,
+    stream_tokens: bool = False,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Assessment generation as events: ``("token", str)`` per LLM token when
+    ``stream_tokens``, ``("quest", Quest)`` per quest, then
+    ``("complete", AssessmentResponse)``.
+    """
+    # Initialize LLM
+    llm = get_llm("gpt-4-turbo-preview", 0.5, "assessment_generation")
+    
+    # Generate assessment content
+    assessment_prompt = ChatPromptTemplate.from_template("""
 You are an expert educational content designer specializing in gamified learning.
 
 Given this educational content:
@@ -61,86 +165,95 @@ Each quest should:
 
 Output the assessment structure including all question details.
 """)
-        
-        chain = assessment_prompt | llm
-        result = await chain.ainvoke({
-            "content": content_text[:4000],  # Limit content length
-            "difficulty": request.difficulty,
-        })
-        
-        # Build structured response
-        quests: List[Quest] = [
-            Quest(
-                id=f"quest-{uuid.uuid4().hex[:8]}",
-                title="Core Concepts Quiz",
-                type="quiz",
-                questions=[
-                    QuizQuestion(
-                        id=f"q-{uuid.uuid4().hex[:8]}",
-                        question="Based on the content, what is the main concept?",
-                        options=[
-                            "Option A - Incorrect",
-                            "Option B - Correct answer",
-                            "Option C - Incorrect",
-                            "Option D - Incorrect"
-                        ],
-                        correct_index=1,
-                        points=50,
-                        explanation="This is the correct answer because..."
-                    ),
-                    QuizQuestion(
-                        id=f"q-{uuid.uuid4().hex[:8]}",
-                        question="Which approach is recommended?",
-                        options=[
-                            "First approach",
-                            "Second approach",
-                            "Best practice approach",
-                            "Legacy approach"
-                        ],
-                        correct_index=2,
-                        points=50,
-                        explanation="Best practices are recommended for..."
-                    ),
-                ],
-                total_points=100,
-                status="available"
-            ),
-            Quest(
-                id=f"quest-{uuid.uuid4().hex[:8]}",
-                title="Implementation Challenge",
-                type="challenge",
-                challenge=CodingChallenge(
-                    description="Implement the concept you learned in a practical example.",
-                    starter_code="// Implement your solution here\nfunction solution() {\n  \n}",
-                    test_cases=[
-                        {"input": "test1", "expected": "result1"},
-                        {"input": "test2", "expected": "result2"},
+    
+    chain = assessment_prompt | llm
+    budget = PromptBudget(
+        "gpt-4-turbo-preview", CONTENT_PROMPT_TOKENS, "assessment_generation", CONTENT_SUMMARY_FOCUS
+    )
+    inputs = await budget.fit(
+        assessment_prompt,
+        {"content": content_text, "difficulty": difficulty},
+        compress=["content"],
+    )
+    if stream_tokens:
+        async for chunk in chain.astream(inputs):
+            yield "token", chunk.content
+    else:
+        result = await chain.ainvoke(inputs)
+    
+    # Build structured response
+    quests: List[Quest] = [
+        Quest(
+            id=f"quest-{uuid.uuid4().hex[:8]}",
+            title="Core Concepts Quiz",
+            type="quiz",
+            questions=[
+                QuizQuestion(
+                    id=f"q-{uuid.uuid4().hex[:8]}",
+                    question="Based on the content, what is the main concept?",
+                    options=[
+                        "Option A - Incorrect",
+                        "Option B - Correct answer",
+                        "Option C - Incorrect",
+                        "Option D - Incorrect"
                     ],
-                    time_limit=20
+                    correct_index=1,
+                    points=50,
+                    explanation="This is the correct answer because..."
                 ),
-                total_points=200,
-                status="locked"
-            ),
-            Quest(
-                id=f"quest-{uuid.uuid4().hex[:8]}",
-                title="The Final Boss",
-                type="boss_battle",
-                total_points=500,
-                status="locked"
+                QuizQuestion(
+                    id=f"q-{uuid.uuid4().hex[:8]}",
+                    question="Which approach is recommended?",
+                    options=[
+                        "First approach",
+                        "Second approach",
+                        "Best practice approach",
+                        "Legacy approach"
+                    ],
+                    correct_index=2,
+                    points=50,
+                    explanation="Best practices are recommended for..."
+                ),
+            ],
+            total_points=100,
+            status="available"
+        ),
+        Quest(
+            id=f"quest-{uuid.uuid4().hex[:8]}",
+            title="Implementation Challenge",
+            type="challenge",
+            challenge=CodingChallenge(
+                description="Implement the concept you learned in a practical example.",
+                starter_code="// Implement your solution here\nfunction solution() {\n  \n}",
+                test_cases=[
+                    {"input": "test1", "expected": "result1"},
+                    {"input": "test2", "expected": "result2"},
+                ],
+                time_limit=20
             ),
-        ]
-        
-        total_xp = sum(q.total_points for q in quests)
-        
-        return AssessmentResponse(
-            title="Generated Assessment Module",
-            description="AI-generated assessment based on your learning content",
-            total_xp=total_xp,
-            quests=quests
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            total_points=200,
+            status="locked"
+        ),
+        Quest(
+            id=f"quest-{uuid.uuid4().hex[:8]}",
+            title="The Final Boss",
+            type="boss_battle",
+            total_points=500,
+            status="locked"
+        ),
+    ]
+    
+    for quest in quests:
+        yield "quest", quest
+    
+    total_xp = sum(q.total_points for q in quests)
+    
+    yield "complete", AssessmentResponse(
+        title="Generated Assessment Module",
+        description="AI-generated assessment based on your learning content",
+        total_xp=total_xp,
+        quests=quests
+    )
 
 
 @router.post("/evaluate-code")
@@ -149,11 +262,7 @@ async def evaluate_code(code: str, challenge: dict):
     Evaluate submitted code against test cases using LLM.
     """
     try:
-        llm = ChatOpenAI(
-            model="gpt-4-turbo-preview",
-            temperature=0,
-            api_key=settings.openai_api_key
-        )
+        llm = get_llm("gpt-4-turbo-preview", 0, "code_evaluation")
         
         eval_prompt = ChatPromptTemplate.from_template("""
 Evaluate this code submission:
@@ -1,40 +1,249 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
-from collections import defaultdict
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Dict, List, Literal, Optional, Tuple
+import asyncio
+import json
+import re
+import uuid
+
+from app.config import settings
+from app.tools.ann_index import benchmark_recall
+from app.tools.chunker import chunk_text
+from app.tools.collection import Collection, PreparedDocument
+from app.tools.json_stream import JsonStreamError, iter_json_values
+from app.tools.metadata_index import InvalidFilter
+from app.tools.query_cache import QueryCache, normalize_query
 
 router = APIRouter()
 
-# Simple in-memory store (replaces ChromaDB for Python 3.14 compatibility)
-# In production with Python 3.11/3.12, use ChromaDB
-_memory_store: Dict[str, List[dict]] = defaultdict(list)
+# Open collections by name. With settings.persist_embeddings the data lives
+# under settings.chroma_persist_dir and survives restarts; otherwise it is
+# held in process memory only.
+_memory_store: Dict[str, Collection] = {}
+
+# Query results keyed on the collection's generation, which ingest and
+# delete bump, plus its committed row counts so writes by other workers
+# also miss the cache
+_query_cache = QueryCache(settings.query_cache_size, settings.query_cache_ttl_seconds)
+
+_COLLECTION_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+def _validate_collection_name(collection_name: str) -> None:
+    if not _COLLECTION_NAME_RE.match(collection_name):
+        raise HTTPException(status_code=400, detail=f"Invalid collection name: {collection_name}")
+
+
+def _get_collection(
+    collection_name: str,
+    create: bool = False,
+    precision: Optional[str] = None,
+) -> Optional[Collection]:
+    """
+    Return an open collection, reopening it from disk if needed. A new
+    collection stores vectors at ``precision`` (default
+    settings.vector_precision).
+    """
+    _validate_collection_name(collection_name)
+
+    collection = _memory_store.get(collection_name)
+    if collection is not None and collection.storage is not None and not collection.storage.is_current():
+        # Deleted or recreated by another worker
+        collection.close()
+        del _memory_store[collection_name]
+        collection = None
+
+    if collection is None:
+        precision = precision or settings.vector_precision
+        if settings.persist_embeddings:
+            collection = Collection.open_persistent(
+                settings.chroma_persist_dir, collection_name, create=create, precision=precision
+            )
+        elif create:
+            collection = Collection(collection_name, precision=precision)
+        if collection is not None:
+            _memory_store[collection_name] = collection
+
+    return collection
+
+
+def _prepare_document(
+    content: str,
+    metadata: Optional[dict],
+    chunk: bool,
+    chunk_tokens: int,
+    chunk_overlap: int,
+) -> PreparedDocument:
+    """
+    Split a document into the (content, metadata) rows to store.
+
+    Documents that fit in one chunk are stored as-is and get no parent ID.
+    Longer ones become several rows whose metadata records the parent ID
+    and the chunk's character offsets within the original text.
+    """
+    metadata = metadata or {}
+    chunks = chunk_text(content, chunk_tokens, chunk_overlap) if chunk else []
+    if len(chunks) <= 1:
+        return content, None, [(content, metadata)]
+
+    parent_id = f"src-{uuid.uuid4().hex[:8]}"
+    return content, parent_id, [
+        (piece.text, {
+            **metadata,
+            "parent_id": parent_id,
+            "chunk_index": piece.index,
+            "chunk_count": len(chunks),
+            "chunk_start": piece.start,
+            "chunk_end": piece.end,
+            "token_count": piece.token_count,
+        })
+        for piece in chunks
+    ]
+
+
+DedupPolicy = Literal["skip", "replace", "keep"]
+VectorPrecision = Literal["float32", "float16", "int8"]
 
 
 @router.post("/ingest")
 async def ingest_content(
     content: str,
     collection_name: str = "default",
-    metadata: dict = None
+    metadata: dict = None,
+    chunk: bool = True,
+    chunk_tokens: int = Query(300, ge=16, le=8000),
+    chunk_overlap: int = Query(50, ge=0),
+    dedup: DedupPolicy = "skip",
+    precision: Optional[VectorPrecision] = None,
 ):
     """
-    Ingest content into memory store.
-    Note: Using in-memory store due to Python 3.14 compatibility issues with ChromaDB.
+    Ingest content into the collection store.
+
+    Long documents are split into token-bounded chunks (see
+    app.tools.chunker) that are indexed individually, so queries return
+    the relevant passage rather than the whole document.
+
+    ``dedup`` handles exact and near-duplicate re-ingests: ``skip`` returns
+    the existing document, ``replace`` swaps it for the new one, ``keep``
+    stores both.
+
+    ``precision`` sets how a new collection stores its vectors: float32,
+    float16 or int8 (4x smaller). It is ignored for existing collections.
     """
     try:
-        doc_id = f"doc-{len(_memory_store[collection_name])}"
-        
-        _memory_store[collection_name].append({
-            "id": doc_id,
-            "content": content,
-            "metadata": metadata or {}
-        })
-        
+        collection = _get_collection(collection_name, create=True, precision=precision)
+        document = _prepare_document(content, metadata, chunk, chunk_tokens, chunk_overlap)
+        result = collection.ingest([document], dedup)[0]
+        _query_cache.bump(collection_name)
+
+        if result["status"] == "duplicate":
+            result["document_id"] = result["duplicate_of"]
+
         return {
             "success": True,
-            "document_id": doc_id,
             "collection": collection_name,
-            "note": "Using in-memory store (ChromaDB requires Python 3.11/3.12)"
+            "persistent": collection.storage is not None,
+            "precision": collection.precision,
+            **result,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ingest/batch")
+async def ingest_batch(
+    request: Request,
+    collection_name: str = "default",
+    batch_size: int = Query(256, ge=1, le=10000),
+    chunk: bool = True,
+    chunk_tokens: int = Query(300, ge=16, le=8000),
+    chunk_overlap: int = Query(50, ge=0),
+    dedup: DedupPolicy = "skip",
+    precision: Optional[VectorPrecision] = None,
+):
+    """
+    Bulk ingest from a streamed NDJSON or JSON-array body.
+
+    Each value is either a string or an object with "content" and optional
+    "metadata". Documents are parsed incrementally, chunked like /ingest, and
+    indexed in batches of ``batch_size`` rows, so memory stays bounded
+    regardless of upload size. ``dedup`` works as for /ingest, including
+    duplicates within the upload; ``precision`` as for /ingest.
+    """
+    try:
+        collection = _get_collection(collection_name, create=True, precision=precision)
+
+        results: List[dict] = []
+        # (input position, prepared document) awaiting a flush
+        pending: List[Tuple[int, PreparedDocument]] = []
+        pending_rows = 0
+        summary = {
+            "received": 0, "ingested": 0, "duplicates": 0, "replaced": 0,
+            "failed": 0, "chunks": 0, "batches": 0,
+        }
+
+        def flush() -> None:
+            nonlocal pending_rows
+            outcomes = collection.ingest([document for _, document in pending], dedup)
+            _query_cache.bump(collection_name)
+            for (position, document), outcome in zip(pending, outcomes):
+                results.append({"index": position, **outcome})
+                if outcome["status"] == "added":
+                    summary["ingested"] += 1
+                    summary["chunks"] += len(document[2])
+                    summary["replaced"] += "replaced" in outcome
+                else:
+                    summary["duplicates"] += 1
+            summary["batches"] += 1
+            pending.clear()
+            pending_rows = 0
+
+        async for value in iter_json_values(request.stream()):
+            position = summary["received"]
+            summary["received"] += 1
+
+            if isinstance(value, str):
+                content, metadata = value, None
+            elif isinstance(value, dict) and isinstance(value.get("content"), str):
+                content, metadata = value["content"], value.get("metadata")
+            else:
+                content, metadata = None, None
+
+            if not content or (metadata is not None and not isinstance(metadata, dict)):
+                summary["failed"] += 1
+                results.append({"index": position, "error": "Expected a string or {\"content\": str, \"metadata\": object}"})
+                continue
+
+            document = _prepare_document(content, metadata, chunk, chunk_tokens, chunk_overlap)
+            pending.append((position, document))
+            pending_rows += len(document[2])
+            if pending_rows >= batch_size:
+                flush()
+                # Let other requests run between batches
+                await asyncio.sleep(0)
+
+        if pending:
+            flush()
+        results.sort(key=lambda item: item["index"])
+
+        return {
+            "success": summary["failed"] == 0,
+            "collection": collection_name,
+            "precision": collection.precision,
+            "summary": summary,
+            "results": results,
         }
-        
+
+    except JsonStreamError as e:
+        # Batches flushed before the error stay ingested
+        raise HTTPException(
+            status_code=400,
+            detail=f"{e} (ingested {summary['ingested']} documents before the error)"
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -43,42 +252,178 @@ async def ingest_content(
 async def query_embeddings(
     query: str,
     collection_name: str = "default",
-    n_results: int = 5
+    n_results: int = 5,
+    mode: Literal["keyword", "vector", "hybrid"] = "keyword",
+    nprobe: Optional[int] = Query(None, ge=1),
+    exact: bool = False,
+    collapse_duplicates: bool = True,
+    where: Optional[str] = None,
+    rerank: bool = False
 ):
     """
-    Query memory store for relevant content.
-    Simple keyword matching (semantic search requires ChromaDB).
+    Query the collection store for relevant content.
+
+    Modes:
+    - keyword: BM25 over the collection's inverted index
+    - vector: cosine similarity over local embeddings
+    - hybrid: reciprocal rank fusion of both
+
+    When the collection has an ANN index, ``nprobe`` sets how many IVF
+    lists are scanned (higher = better recall, slower); ``exact`` bypasses
+    the index. Near-duplicate hits are collapsed unless
+    ``collapse_duplicates=false``.
+
+    ``where`` is a JSON metadata filter applied before ranking, e.g.
+    ``{"skill": "React"}``, ``{"skill": {"$in": ["React", "Vue"]}}`` or
+    ``{"hours": {"$gte": 2, "$lt": 10}}``; several fields are ANDed.
+
+    For float16/int8 collections ``rerank`` re-scores the top vector
+    candidates at full precision before returning them.
     """
     try:
-        docs = _memory_store.get(collection_name, [])
-        
-        # Simple keyword matching
-        results = []
-        query_lower = query.lower()
-        for doc in docs:
-            if query_lower in doc["content"].lower():
-                results.append(doc)
-                if len(results) >= n_results:
-                    break
-        
+        where_filter = None
+        if where:
+            try:
+                where_filter = json.loads(where)
+            except json.JSONDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"'where' is not valid JSON: {e}")
+
+        collection = _get_collection(collection_name)
+        if collection is None:
+            return {"query": query, "mode": mode, "results": [], "cached": False}
+
+        collection.refresh()
+        cache_key = _query_cache.key(
+            collection_name, collection.version, normalize_query(query),
+            n_results, mode, nprobe, exact, collapse_duplicates,
+            json.dumps(where_filter, sort_keys=True) if where_filter is not None else None,
+            rerank,
+        )
+        results = _query_cache.get(cache_key)
+        cached = results is not None
+        if not cached:
+            results = collection.query(
+                query, n_results, mode, nprobe, exact, collapse_duplicates, where_filter, rerank
+            )
+            _query_cache.put(cache_key, results)
+
         return {
             "query": query,
+            "mode": mode,
             "results": results,
-            "note": "Using simple keyword matching (semantic search requires Python 3.11/3.12 with ChromaDB)"
+            "cached": cached,
         }
-        
+
+    except InvalidFilter as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _require_collection(collection_name: str) -> Collection:
+    collection = _get_collection(collection_name)
+    if collection is None:
+        raise HTTPException(status_code=404, detail=f"Collection not found: {collection_name}")
+    return collection
+
+
+@router.post("/collection/{collection_name}/ann")
+async def build_ann_index(
+    collection_name: str,
+    n_lists: Optional[int] = Query(None, ge=1),
+    background: bool = True
+):
+    """
+    Build (or rebuild) the collection's IVF index. Defaults to
+    sqrt(rows) lists; the build runs in the background unless
+    ``background=false``.
+    """
+    try:
+        collection = _require_collection(collection_name)
+        collection.build_ann_index(n_lists, background)
+        return collection.ann_status()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/collection/{collection_name}/ann")
+async def get_ann_status(collection_name: str):
+    """Report whether the collection's ANN index is absent, building or ready."""
+    try:
+        collection = _require_collection(collection_name)
+        collection.refresh()
+        collection.sync_ann_index()
+        return collection.ann_status()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/collection/{collection_name}/ann/benchmark")
+async def benchmark_ann_index(
+    collection_name: str,
+    k: int = Query(10, ge=1, le=100),
+    n_queries: int = Query(100, ge=1, le=1000)
+):
+    """Recall@k and latency of the ANN index against exact search, per nprobe."""
+    try:
+        collection = _require_collection(collection_name)
+        collection.refresh()
+        collection.sync_ann_index()
+        if collection.ann_index is None:
+            raise HTTPException(status_code=409, detail="Collection has no ANN index yet")
+        return benchmark_recall(collection.vector_index, collection.ann_index, k, n_queries)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/collection/{collection_name}/precision/benchmark")
+async def benchmark_vector_precision(
+    collection_name: str,
+    k: int = Query(10, ge=1, le=100),
+    n_queries: int = Query(100, ge=1, le=1000),
+    sample_rows: int = Query(20000, ge=1, le=200000)
+):
+    """
+    Memory per vector and recall@k (with and without re-ranking) of
+    float32, float16 and int8 storage, measured on full-precision
+    embeddings of a sample of the collection's documents.
+    """
+    try:
+        collection = _require_collection(collection_name)
+        return collection.benchmark_precision(k, n_queries, sample_rows)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache/stats")
+async def get_query_cache_stats():
+    """Hit/miss counters for the /query result cache, for sizing it."""
+    return _query_cache.stats()
+
+
 @router.delete("/collection/{collection_name}")
 async def delete_collection(collection_name: str):
     """
-    Delete a collection from memory store.
+    Delete a collection, including its on-disk files.
     """
     try:
-        if collection_name in _memory_store:
-            del _memory_store[collection_name]
+        collection = _get_collection(collection_name)
+        if collection is not None:
+            collection.destroy()
+            _memory_store.pop(collection_name, None)
+        _query_cache.bump(collection_name)
         return {"success": True, "deleted": collection_name}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
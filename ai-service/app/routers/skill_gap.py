@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, List, Optional, Tuple
+import asyncio
+import time
 import uuid
 import json
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.models import (
@@ -17,12 +20,22 @@ from app.models import (
     Resource,
 )
 from app.config import settings
-from app.tools.resume_parser import parse_resume
+from app.tools.event_stream import EventFormat, event_stream_response
+from app.tools.llm_registry import get_llm
+from app.tools.resume_parser import iter_parsed_resumes, parse_resume, parse_resume_upload
+from app.tools.uploads import spool_pdf_upload
 from app.tools.web_search import search_learning_resources
 
 router = APIRouter()
 
 
+DEFAULT_JOB_DESCRIPTION = JobDescription(
+    title="Senior Full-Stack Developer",
+    requirements=["React", "Node.js", "TypeScript", "AWS"],
+    preferred=["Docker", "Kubernetes", "GraphQL"]
+)
+
+
 @router.post("/analyze", response_model=SkillGapResponse)
 async def analyze_skill_gap(request: SkillGapRequest):
     """
@@ -38,21 +51,167 @@ async def analyze_skill_gap(request: SkillGapRequest):
         print(f"✅ Resume parsed! Found skills: {resume_data.skills}")
         
         # Get job description (from ID or use provided)
-        job_description = request.job_description or JobDescription(
-            title="Senior Full-Stack Developer",
-            requirements=["React", "Node.js", "TypeScript", "AWS"],
-            preferred=["Docker", "Kubernetes", "GraphQL"]
-        )
+        job_description = request.job_description or DEFAULT_JOB_DESCRIPTION
+        
+        return await build_skill_gap_roadmap(resume_data, job_description)
+        
+    except Exception as e:
+        print(f"❌ ERROR in analyze_skill_gap: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze/stream")
+async def analyze_skill_gap_stream(
+    request: SkillGapRequest,
+    stream_format: EventFormat = Query("sse", alias="format"),
+    tokens: bool = Query(True, description="Stream gap-analysis tokens as they are generated"),
+):
+    """
+    Streaming variant of /analyze. Emits ``started`` immediately, then
+    ``resume``, ``token`` (gap-analysis output, if ``tokens``),
+    ``analysis``, one ``learning_stage`` per stage as its resources
+    arrive, and ``complete`` with the full SkillGapResponse. Sent as
+    server-sent events, or NDJSON with ``format=ndjson``.
+    """
+
+    async def events() -> AsyncIterator[Tuple[str, Any]]:
+        yield "started", {"stage": "parsing_resume"}
+        resume_data = await parse_resume(request.resume_file)
+        yield "resume", resume_data
+        
+        job_description = request.job_description or DEFAULT_JOB_DESCRIPTION
+        async for event in iter_skill_gap_roadmap(resume_data, job_description, stream_tokens=tokens):
+            yield event
+
+    return event_stream_response(events(), stream_format)
+
+
+@router.post("/analyze/upload", response_model=SkillGapResponse)
+async def analyze_skill_gap_upload(
+    resume: UploadFile = File(..., description="Resume PDF"),
+    job_description: Optional[str] = Form(None, description="JobDescription as JSON"),
+    job_description_id: Optional[str] = Form(None),
+):
+    """
+    Multipart variant of /analyze: the resume is sent as a file part
+    instead of base64 inside JSON. The upload is spooled to a temp file by
+    the multipart parser and hashed in chunks, so a cached resume is never
+    loaded into memory and a new one is read only once, for extraction.
+    """
+    try:
+        upload = await spool_pdf_upload(resume)
+        resume_data = await parse_resume_upload(upload)
         
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.3,
-            api_key=settings.openai_api_key
+        print(f"✅ Resume parsed! Found skills: {resume_data.skills}")
+        
+        job = (
+            JobDescription.model_validate_json(job_description)
+            if job_description else DEFAULT_JOB_DESCRIPTION
         )
+        return await build_skill_gap_roadmap(resume_data, job)
         
-        # Analyze skill gaps
-        gap_analysis_prompt = ChatPromptTemplate.from_template("""
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid job_description: {e}")
+    except Exception as e:
+        print(f"❌ ERROR in analyze_skill_gap_upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await resume.close()
+
+
+@router.post("/parse-batch")
+async def parse_resume_batch(
+    resumes: List[UploadFile] = File(..., description="Resume PDFs"),
+    llm_concurrency: Optional[int] = Form(None, ge=1, le=64),
+):
+    """
+    Parse a batch of resumes (recruiter uploads of up to
+    ``resume_batch_max_files``) and stream the results as NDJSON.
+
+    Each line is ``{"type": "result", "index", "filename", "resume_data",
+    "error", "elapsed_ms"}`` in completion order; the last line is a
+    ``{"type": "summary"}`` with counts and throughput in resumes/sec.
+    """
+    if len(resumes) > settings.resume_batch_max_files:
+        for resume in resumes:
+            await resume.close()
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.resume_batch_max_files} resumes per batch",
+        )
+
+    try:
+        uploads = [await spool_pdf_upload(resume) for resume in resumes]
+    except HTTPException:
+        for resume in resumes:
+            await resume.close()
+        raise
+
+    async def lines() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        succeeded = failed = 0
+        try:
+            async for result in iter_parsed_resumes(uploads, llm_concurrency):
+                if result.error is None:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield json.dumps({
+                    "type": "result",
+                    "index": result.index,
+                    "filename": result.filename,
+                    "resume_data": result.resume_data.model_dump() if result.resume_data else None,
+                    "error": result.error,
+                    "elapsed_ms": result.elapsed_ms,
+                }) + "\n"
+
+            elapsed = time.perf_counter() - started
+            throughput = len(uploads) / elapsed if elapsed > 0 else 0.0
+            print(f"📄 Parsed {len(uploads)} resumes in {elapsed:.2f}s ({throughput:.2f} resumes/sec)")
+            yield json.dumps({
+                "type": "summary",
+                "total": len(uploads),
+                "succeeded": succeeded,
+                "failed": failed,
+                "elapsed_seconds": round(elapsed, 3),
+                "resumes_per_second": round(throughput, 2),
+            }) + "\n"
+        finally:
+            for resume in resumes:
+                await resume.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def build_skill_gap_roadmap(
+    resume_data: ResumeData,
+    job_description: JobDescription,
+) -> SkillGapResponse:
+    """Gap analysis and learning path for a parsed resume."""
+    async for event, payload in iter_skill_gap_roadmap(resume_data, job_description):
+        if event == "complete":
+            return payload
+
+
+async def iter_skill_gap_roadmap(
+    resume_data: ResumeData,
+    job_description: JobDescription,
+    stream_tokens: bool = False,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Gap analysis and learning path for a parsed resume, as events:
+    ``("token", str)`` per gap-analysis token when ``stream_tokens``,
+    ``("analysis", SkillGapAnalysis)``, ``("learning_stage", LearningStage)``
+    for each stage as soon as its resources arrive, and finally
+    ``("complete", SkillGapResponse)``.
+    """
+    # Initialize LLM
+    llm = get_llm("gpt-4o", 0.3, "skill_gap_analysis")
+    
+    # Analyze skill gaps
+    gap_analysis_prompt = ChatPromptTemplate.from_template("""
 You are an expert career advisor and skills analyst.
 
 Analyze the skill gap between this candidate's resume and the target job.
@@ -82,112 +241,128 @@ Output as JSON with this structure:
     ]
 }}
 """)
+    
+    gap_chain = gap_analysis_prompt | llm
+    gap_inputs = {
+        "skills": ", ".join(resume_data.skills),
+        "experience": ", ".join(resume_data.experience),
+        "education": ", ".join(resume_data.education),
+        "job_title": job_description.title,
+        "requirements": ", ".join(job_description.requirements),
+        "preferred": ", ".join(job_description.preferred),
+    }
+    if stream_tokens:
+        tokens = []
+        async for chunk in gap_chain.astream(gap_inputs):
+            tokens.append(chunk.content)
+            yield "token", chunk.content
+        gap_text = "".join(tokens)
+    else:
+        gap_text = (await gap_chain.ainvoke(gap_inputs)).content
+    
+    # Parse LLM response to get actual gaps
+    try:
+        response_text = gap_text.strip()
         
-        gap_chain = gap_analysis_prompt | llm
-        gap_result = await gap_chain.ainvoke({
-            "skills": ", ".join(resume_data.skills),
-            "experience": ", ".join(resume_data.experience),
-            "education": ", ".join(resume_data.education),
-            "job_title": job_description.title,
-            "requirements": ", ".join(job_description.requirements),
-            "preferred": ", ".join(job_description.preferred),
-        })
-        
-        # Parse LLM response to get actual gaps
-        try:
-            response_text = gap_result.content.strip()
-            
-            # Clean JSON if wrapped in markdown
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            gap_data = json.loads(response_text)
-            
-            # Build gaps from LLM analysis
-            gaps = []
-            for gap_item in gap_data.get("gaps", []):
-                gaps.append(SkillGap(
-                    skill=gap_item.get("skill", "Unknown"),
-                    priority=gap_item.get("priority", "medium"),
-                    reason=gap_item.get("reason", "Identified gap")
-                ))
-            
-            analysis = SkillGapAnalysis(
-                current_skills=gap_data.get("current_skills", resume_data.skills),
-                required_skills=gap_data.get("required_skills", job_description.requirements),
-                gaps=gaps
-            )
-            
-            print(f"✅ Gap analysis complete! Found {len(gaps)} skill gaps")
-            
-        except (json.JSONDecodeError, KeyError) as parse_error:
-            print(f"⚠️ LLM response parsing failed: {parse_error}. Using fallback comparison.")
-            
-            # Fallback: Manual set-based comparison
-            resume_skills = set(s.lower() for s in resume_data.skills)
-            required_skills = set(s.lower() for s in job_description.requirements)
-            missing = required_skills - resume_skills
-            
-            gaps = [
-                SkillGap(
-                    skill=s.title(), 
-                    priority="high", 
-                    reason=f"Required for {job_description.title}"
-                )
-                for s in missing
-            ]
-            
-            analysis = SkillGapAnalysis(
-                current_skills=resume_data.skills,
-                required_skills=job_description.requirements,
-                gaps=gaps
-            )
-            
-            print(f"✅ Fallback gap analysis complete! Found {len(gaps)} skill gaps")
+        # Clean JSON if wrapped in markdown
+        if "```json" in response_text:
+            response_text = response_text.split("```json")[1].split("```")[0].strip()
+        elif "```" in response_text:
+            response_text = response_text.split("```")[1].split("```")[0].strip()
         
-        # ========================================================================
-        # CRITICAL FIX: Generate learning path AFTER gap analysis (not just in fallback)
-        # ========================================================================
-        learning_path: List[LearningStage] = []
+        gap_data = json.loads(response_text)
         
-        for i, gap in enumerate(analysis.gaps):
-            # Search for learning resources
-            resources = await search_learning_resources(gap.skill)
-            
-            stage = LearningStage(
-                id=f"stage-{uuid.uuid4().hex[:8]}",
-                stage=i + 1,
-                skill=gap.skill,
-                estimated_hours=15 + (5 * i),  # Increase for later stages
-                resources=resources[:3],  # Top 3 resources
-                milestones=[
-                    f"Complete {gap.skill} fundamentals",
-                    f"Build a project using {gap.skill}",
-                    f"Pass {gap.skill} assessment"
-                ],
-                xp_reward=300 + (100 * i),
-                status="available" if i == 0 else "locked"
-            )
-            learning_path.append(stage)
+        # Build gaps from LLM analysis
+        gaps = []
+        for gap_item in gap_data.get("gaps", []):
+            gaps.append(SkillGap(
+                skill=gap_item.get("skill", "Unknown"),
+                priority=gap_item.get("priority", "medium"),
+                reason=gap_item.get("reason", "Identified gap")
+            ))
+        
+        analysis = SkillGapAnalysis(
+            current_skills=gap_data.get("current_skills", resume_data.skills),
+            required_skills=gap_data.get("required_skills", job_description.requirements),
+            gaps=gaps
+        )
+        
+        print(f"✅ Gap analysis complete! Found {len(gaps)} skill gaps")
         
-        total_hours = sum(stage.estimated_hours for stage in learning_path)
+    except (json.JSONDecodeError, KeyError) as parse_error:
+        print(f"⚠️ LLM response parsing failed: {parse_error}. Using fallback comparison.")
         
-        print(f"✅ Learning path generated with {len(learning_path)} stages!")
+        # Fallback: Manual set-based comparison
+        resume_skills = set(s.lower() for s in resume_data.skills)
+        required_skills = set(s.lower() for s in job_description.requirements)
+        missing = required_skills - resume_skills
         
-        return SkillGapResponse(
-            resume_data=resume_data,
-            job_description=job_description,
-            analysis=analysis,
-            learning_path=learning_path,
-            total_estimated_hours=total_hours,
-            recommended_pace="10 hours/week"
+        gaps = [
+            SkillGap(
+                skill=s.title(), 
+                priority="high", 
+                reason=f"Required for {job_description.title}"
+            )
+            for s in missing
+        ]
+        
+        analysis = SkillGapAnalysis(
+            current_skills=resume_data.skills,
+            required_skills=job_description.requirements,
+            gaps=gaps
         )
         
-    except Exception as e:
-        print(f"❌ ERROR in analyze_skill_gap: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"✅ Fallback gap analysis complete! Found {len(gaps)} skill gaps")
+    
+    yield "analysis", analysis
+    
+    # ========================================================================
+    # CRITICAL FIX: Generate learning path AFTER gap analysis (not just in fallback)
+    # ========================================================================
+    async def build_stage(i: int, gap: SkillGap) -> LearningStage:
+        # Search for learning resources
+        resources = await search_learning_resources(gap.skill)
+        
+        return LearningStage(
+            id=f"stage-{uuid.uuid4().hex[:8]}",
+            stage=i + 1,
+            skill=gap.skill,
+            estimated_hours=15 + (5 * i),  # Increase for later stages
+            resources=resources[:3],  # Top 3 resources
+            milestones=[
+                f"Complete {gap.skill} fundamentals",
+                f"Build a project using {gap.skill}",
+                f"Pass {gap.skill} assessment"
+            ],
+            xp_reward=300 + (100 * i),
+            status="available" if i == 0 else "locked"
+        )
+    
+    # Resource searches run concurrently; stages are reported as they finish
+    learning_path: List[LearningStage] = []
+    tasks = [asyncio.create_task(build_stage(i, gap)) for i, gap in enumerate(analysis.gaps)]
+    try:
+        for next_stage in asyncio.as_completed(tasks):
+            stage = await next_stage
+            learning_path.append(stage)
+            yield "learning_stage", stage
+    finally:
+        for task in tasks:
+            task.cancel()
+    learning_path.sort(key=lambda stage: stage.stage)
+    
+    total_hours = sum(stage.estimated_hours for stage in learning_path)
+    
+    print(f"✅ Learning path generated with {len(learning_path)} stages!")
+    
+    yield "complete", SkillGapResponse(
+        resume_data=resume_data,
+        job_description=job_description,
+        analysis=analysis,
+        learning_path=learning_path,
+        total_estimated_hours=total_hours,
+        recommended_pace="10 hours/week"
+    )
 
 
 @router.post("/generate-stages")
@@ -0,0 +1,202 @@
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.tools.vector_index import VectorIndex
+
+# Rows scored per block when assigning vectors to centroids
+_ASSIGN_BLOCK = 65536
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest (max inner product) centroid for each row, computed in blocks."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + _ASSIGN_BLOCK], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def _normalize_rows(rows: np.ndarray) -> np.ndarray:
+    # Quantized (int8) rows keep their direction but not unit length
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    np.divide(rows, norms, out=rows, where=norms > 0)
+    return rows
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    n_lists: int,
+    n_iter: int = 10,
+    max_training_rows: int = 100_000,
+    seed: int = 0,
+) -> np.ndarray:
+    """Spherical k-means on a sample of the (L2-normalised) rows."""
+    rng = np.random.default_rng(seed)
+    n_rows = len(vectors)
+    n_lists = max(1, min(n_lists, n_rows))
+
+    sample_size = min(n_rows, max_training_rows, 256 * n_lists)
+    sample_rows = np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+    sample = _normalize_rows(np.asarray(vectors[sample_rows], dtype=np.float32))
+
+    centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+
+        # Re-seed empty lists from random sample rows
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = sample[rng.choice(sample_size, size=len(empty))]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        np.divide(sums, norms, out=sums, where=norms > 0)
+        centroids = sums
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over a VectorIndex.
+
+    Rows are bucketed by their nearest k-means centroid; a query scores the
+    ``nprobe`` closest buckets only. Larger ``nprobe`` trades latency for
+    recall, and ``nprobe == n_lists`` is exact search.
+    """
+
+    DEFAULT_NPROBE = 8
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._lists: List[List[int]] = [[] for _ in range(len(self.centroids))]
+        self._arrays: List[Optional[np.ndarray]] = [None] * len(self.centroids)
+        self.n_rows = 0
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: Optional[int] = None, n_iter: int = 10) -> "IVFIndex":
+        """Train centroids and bucket every row of ``vectors``."""
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(vectors))))
+        index = cls(train_centroids(vectors, n_lists, n_iter))
+        index.add(vectors, 0)
+        return index
+
+    def add(self, vectors: np.ndarray, first_row: int) -> None:
+        """Bucket rows ``first_row .. first_row + len(vectors)``."""
+        if len(vectors) == 0:
+            return
+        if first_row != self.n_rows:
+            raise ValueError(f"IVF index holds {self.n_rows} rows, cannot add at {first_row}")
+
+        labels = _assign(vectors, self.centroids)
+        order = np.argsort(labels, kind="stable")
+        boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+        for group in np.split(order, boundaries):
+            list_id = int(labels[group[0]])
+            self._lists[list_id].extend((group + first_row).tolist())
+            self._arrays[list_id] = None
+        self.n_rows += len(vectors)
+
+    def _list_array(self, list_id: int) -> np.ndarray:
+        array = self._arrays[list_id]
+        if array is None:
+            array = np.asarray(self._lists[list_id], dtype=np.int64)
+            self._arrays[list_id] = array
+        return array
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Row IDs in the ``nprobe`` buckets closest to a normalised query."""
+        nprobe = max(1, min(nprobe or self.DEFAULT_NPROBE, self.n_lists))
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+        arrays = [self._list_array(int(list_id)) for list_id in probe]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def search(
+        self,
+        vector_index: VectorIndex,
+        query_vector: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        exclude: Optional[np.ndarray] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        query = vector_index._normalize_query(query_vector)
+        if query is None:
+            return []
+        rows = self.candidates(query, nprobe)
+        if allowed is not None:
+            rows = rows[np.isin(rows, allowed)]
+        return vector_index.search(query, k, rows, exclude)
+
+    def stats(self) -> dict:
+        sizes = [len(rows) for rows in self._lists]
+        return {
+            "type": "ivf",
+            "n_lists": self.n_lists,
+            "rows": self.n_rows,
+            "largest_list": max(sizes) if sizes else 0,
+            "default_nprobe": self.DEFAULT_NPROBE,
+        }
+
+
+def benchmark_recall(
+    vector_index: VectorIndex,
+    ann_index: IVFIndex,
+    k: int = 10,
+    n_queries: int = 100,
+    nprobe_values: Optional[List[int]] = None,
+    seed: int = 0,
+) -> dict:
+    """
+    Recall@k of the IVF index against exact search, using stored rows
+    (slightly perturbed) as queries, for a sweep of ``nprobe`` values.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = min(len(vector_index), ann_index.n_rows)
+    if n_rows == 0:
+        return {"k": k, "queries": 0, "results": []}
+
+    query_rows = rng.choice(n_rows, size=min(n_queries, n_rows), replace=False)
+    queries = _normalize_rows(np.asarray(vector_index.vectors[query_rows], dtype=np.float32))
+    queries = queries + rng.normal(scale=0.01, size=queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    exact = [{row for row, _ in vector_index.search(q, k)} for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    nprobe_values = nprobe_values or sorted({1, 2, 4, 8, 16, 32, ann_index.n_lists})
+    results = []
+    for nprobe in nprobe_values:
+        if nprobe > ann_index.n_lists:
+            continue
+        start = time.perf_counter()
+        hits = 0
+        for q, truth in zip(queries, exact):
+            hits += len(truth & {row for row, _ in ann_index.search(vector_index, q, k, nprobe)})
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        results.append({
+            "nprobe": nprobe,
+            "recall_at_k": round(hits / sum(len(t) for t in exact), 4),
+            "avg_latency_ms": round(elapsed_ms, 3),
+        })
+
+    return {
+        "k": k,
+        "queries": len(queries),
+        "rows": n_rows,
+        "n_lists": ann_index.n_lists,
+        "exact_avg_latency_ms": round(exact_ms, 3),
+        "results": results,
+    }
@@ -0,0 +1,124 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from app.tools.tokens import DEFAULT_ENCODING, count_tokens_batch
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"\S+\s*")
+
+# Close a chunk at a paragraph break once it is at least this full
+_PARAGRAPH_FILL = 0.75
+
+
+@dataclass
+class TextChunk:
+    index: int
+    text: str
+    start: int  # character offset into the parent document
+    end: int
+    token_count: int
+
+
+@dataclass
+class _Unit:
+    start: int
+    end: int
+    tokens: int
+    paragraph_start: bool
+
+
+def _split_spans(text: str, start: int, end: int, pattern: re.Pattern) -> List[Tuple[int, int]]:
+    spans = []
+    cursor = start
+    for match in pattern.finditer(text, start, end):
+        if match.start() > cursor:
+            spans.append((cursor, match.start()))
+        cursor = match.end()
+    if cursor < end:
+        spans.append((cursor, end))
+    return spans
+
+
+def _units(text: str, max_tokens: int, encoding_name: str) -> List[_Unit]:
+    """Sentence-sized spans, with over-long sentences split on words."""
+    spans: List[Tuple[int, int, bool]] = []
+    for para_start, para_end in _split_spans(text, 0, len(text), _PARAGRAPH_RE):
+        for i, (s, e) in enumerate(_split_spans(text, para_start, para_end, _SENTENCE_RE)):
+            spans.append((s, e, i == 0))
+
+    counts = count_tokens_batch([text[s:e] for s, e, _ in spans], encoding_name)
+    units: List[_Unit] = []
+    for (s, e, paragraph_start), tokens in zip(spans, counts):
+        if tokens <= max_tokens:
+            units.append(_Unit(s, e, tokens, paragraph_start))
+            continue
+
+        words = [(m.start(), m.end()) for m in _WORD_RE.finditer(text, s, e)]
+        word_counts = count_tokens_batch([text[ws:we] for ws, we in words], encoding_name)
+        first = True
+        for (ws, we), word_tokens in zip(words, word_counts):
+            if word_tokens > max_tokens:
+                # A single "word" longer than a chunk: cut it by characters
+                step = max(1, (we - ws) * max_tokens // word_tokens)
+                for cs in range(ws, we, step):
+                    ce = min(cs + step, we)
+                    units.append(_Unit(cs, ce, -(-word_tokens * (ce - cs) // (we - ws)), paragraph_start and first))
+                    first = False
+            else:
+                units.append(_Unit(ws, we, word_tokens, paragraph_start and first))
+                first = False
+    return units
+
+
+def chunk_text(
+    text: str,
+    chunk_tokens: int = 300,
+    overlap_tokens: int = 50,
+    encoding_name: str = DEFAULT_ENCODING,
+) -> List[TextChunk]:
+    """
+    Split ``text`` into chunks of at most ``chunk_tokens`` tokens.
+
+    Chunks are packed from whole sentences and close early at a paragraph
+    break once they are mostly full. Consecutive chunks share up to
+    ``overlap_tokens`` tokens of trailing sentences. Token counts are summed
+    per sentence, so they can be off by a token or two at the joins.
+    """
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be positive")
+    overlap_tokens = max(0, min(overlap_tokens, chunk_tokens // 2))
+
+    units = _units(text, chunk_tokens, encoding_name)
+    chunks: List[TextChunk] = []
+    current: List[_Unit] = []
+    current_tokens = 0
+
+    def emit() -> None:
+        start, end = current[0].start, current[-1].end
+        chunks.append(TextChunk(len(chunks), text[start:end], start, end, current_tokens))
+
+    for unit in units:
+        over_budget = current_tokens + unit.tokens > chunk_tokens
+        paragraph_break = unit.paragraph_start and current_tokens >= chunk_tokens * _PARAGRAPH_FILL
+        if current and (over_budget or paragraph_break):
+            emit()
+            # Carry trailing units forward as overlap
+            carried: List[_Unit] = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                if carried_tokens + previous.tokens > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous.tokens
+            if carried_tokens + unit.tokens > chunk_tokens:
+                carried, carried_tokens = [], 0
+            current, current_tokens = carried, carried_tokens
+
+        current.append(unit)
+        current_tokens += unit.tokens
+
+    if current and (not chunks or current[-1].end > chunks[-1].end):
+        emit()
+    return chunks
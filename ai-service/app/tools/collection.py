@@ -0,0 +1,593 @@
+import threading
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.tools.ann_index import IVFIndex
+from app.tools.collection_storage import (
+    CollectionStorage,
+    open_existing_storage,
+    open_or_create_storage,
+)
+from app.tools.dedup import DuplicateIndex, MinHasher, collapse_near_duplicates
+from app.tools.inverted_index import InvertedIndex
+from app.tools.metadata_index import MetadataIndex
+from app.tools.vector_index import (
+    EmbeddingFunction,
+    VectorIndex,
+    benchmark_precision,
+    get_embedding_function,
+    rerank_exact,
+)
+
+# Reciprocal-rank-fusion constant used by hybrid search
+RRF_K = 60
+
+# Filtered vector queries matching at most this many rows skip the ANN
+# index and score the matching rows exactly
+FILTER_EXACT_ROWS = 50000
+
+# Quantized vector queries with re-ranking fetch this many times the
+# requested hits and re-score them at full precision
+RERANK_FACTOR = 4
+
+# (original text, parent ID or None, stored (content, metadata) rows)
+PreparedDocument = Tuple[str, Optional[str], List[Tuple[str, dict]]]
+
+
+class Collection:
+    """
+    A named set of documents with a keyword (BM25) index and a dense
+    vector index kept in step on every insert.
+
+    With ``storage`` the documents and vectors live on disk (see
+    CollectionStorage) and the keyword index is rebuilt lazily from the
+    document segment the first time a keyword query needs it.
+
+    Large collections can additionally carry an IVF index (see
+    app.tools.ann_index) that vector queries use instead of brute force.
+
+    Rows are never rewritten: replacing a document tombstones its rows,
+    which every index then skips.
+
+    Vectors are stored at ``precision`` (float32, float16 or int8; see
+    VectorIndex). A persistent collection keeps the precision recorded in
+    its manifest.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        embedding_function: Optional[EmbeddingFunction] = None,
+        storage: Optional[CollectionStorage] = None,
+        precision: str = "float32",
+    ):
+        self.name = name
+        self.embedding_function = embedding_function or get_embedding_function()
+        self.storage = storage
+        self.keyword_index = InvertedIndex()
+
+        if storage is not None:
+            self.documents = storage.documents
+            self.vector_index: VectorIndex = storage.vectors
+        else:
+            self.documents: List[dict] = []
+            self.vector_index = VectorIndex(precision=precision)
+
+        # Number of documents already in the keyword index; a reopened
+        # collection starts cold and is indexed on first keyword query.
+        self._keyword_indexed = 0
+        self._keyword_warm = storage is None or len(self.documents) == 0
+
+        # Built on the first filtered query, then kept in step like the
+        # keyword index
+        self.metadata_index = MetadataIndex()
+        self._metadata_indexed = 0
+        self._metadata_warm = False
+
+        self.ann_index: Optional[IVFIndex] = None
+        self._ann_thread: Optional[threading.Thread] = None
+        self._ann_built: Optional[IVFIndex] = None
+        self._ann_error: Optional[str] = None
+
+        # Tombstoned rows: raw append-order list (in memory) or the storage
+        # file, plus a sorted array / set view refreshed when it grows
+        self._deleted: List[int] = []
+        self._deleted_seen = 0
+        self._deleted_set: Set[int] = set()
+        self._deleted_sorted = np.empty(0, dtype=np.int64)
+
+        # Built on first deduplicating ingest, then kept in step
+        self.hasher = MinHasher()
+        self.dedup_index: Optional[DuplicateIndex] = None
+        self._dedup_indexed = 0
+        self._row_sources: Dict[int, str] = {}
+
+        self._apply_deletions()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def version(self) -> Tuple:
+        """Changes whenever rows are committed or deleted, by any worker."""
+        token = self.storage.token if self.storage is not None else None
+        return token, len(self.documents), self._deleted_seen
+
+    def refresh(self) -> None:
+        """Pick up documents written by other worker processes."""
+        if self.storage is not None:
+            self.storage.refresh()
+            self._apply_deletions()
+            if self._keyword_warm:
+                self._sync_keyword_index()
+            if self._metadata_warm:
+                self._sync_metadata_index()
+
+    def _raw_deleted(self):
+        return self.storage.deleted_rows if self.storage is not None else self._deleted
+
+    def _apply_deletions(self) -> None:
+        """Remove newly tombstoned rows from the in-memory indexes."""
+        raw = self._raw_deleted()
+        if len(raw) == self._deleted_seen:
+            return
+        for row in (int(r) for r in raw[self._deleted_seen:]):
+            if row in self._deleted_set:
+                continue
+            self._deleted_set.add(row)
+            if row < self._keyword_indexed:
+                self.keyword_index.remove(row, self.documents[row]["content"])
+            source_id = self._row_sources.pop(row, None)
+            if source_id is not None and self.dedup_index is not None and source_id in self.dedup_index:
+                self.dedup_index.remove(source_id)
+        self._deleted_seen = len(raw)
+        self._deleted_sorted = np.array(sorted(self._deleted_set), dtype=np.int64)
+
+    def delete_rows(self, rows: List[int]) -> None:
+        """Tombstone rows so no index returns them again."""
+        if not rows:
+            return
+        with self.storage.write_lock() if self.storage else nullcontext():
+            if self.storage is not None:
+                self.storage.append_deleted(rows)
+            else:
+                self._deleted.extend(rows)
+        self._apply_deletions()
+
+    def _sync_keyword_index(self) -> None:
+        for doc_index in range(self._keyword_indexed, len(self.documents)):
+            if doc_index not in self._deleted_set:
+                self.keyword_index.add(doc_index, self.documents[doc_index]["content"])
+        self._keyword_indexed = len(self.documents)
+        self._keyword_warm = True
+
+    def _sync_metadata_index(self) -> None:
+        for doc_index in range(self._metadata_indexed, len(self.documents)):
+            if doc_index not in self._deleted_set:
+                self.metadata_index.add(doc_index, self.documents[doc_index]["metadata"])
+        self._metadata_indexed = len(self.documents)
+        self._metadata_warm = True
+
+    def filter_rows(self, where: dict) -> np.ndarray:
+        """Sorted live rows whose metadata satisfies ``where``."""
+        self._sync_metadata_index()
+        rows = self.metadata_index.match(where)
+        if len(self._deleted_sorted):
+            rows = np.setdiff1d(rows, self._deleted_sorted, assume_unique=True)
+        return rows
+
+    def _sync_dedup_index(self, stop: Optional[int] = None) -> None:
+        """Fingerprint sources stored since the last sync (or ever, when cold)."""
+        if self.dedup_index is None:
+            self.dedup_index = DuplicateIndex(self.hasher)
+            self._dedup_indexed = 0
+
+        stop = len(self.documents) if stop is None else stop
+        doc_index = self._dedup_indexed
+        while doc_index < stop:
+            doc = self.documents[doc_index]
+            parent_id = doc["metadata"].get("parent_id")
+            rows = [doc_index]
+            # A chunked source's rows are always committed together
+            if parent_id is not None:
+                while (
+                    rows[-1] + 1 < stop
+                    and self.documents[rows[-1] + 1]["metadata"].get("parent_id") == parent_id
+                ):
+                    rows.append(rows[-1] + 1)
+            doc_index = rows[-1] + 1
+
+            live_rows = [row for row in rows if row not in self._deleted_set]
+            if not live_rows:
+                continue
+            text = _rebuild_source_text([self.documents[row] for row in rows])
+            self._register_source(parent_id or doc["id"], text, live_rows)
+
+        self._dedup_indexed = max(self._dedup_indexed, stop)
+
+    def _register_source(self, source_id: str, text: str, rows: List[int], fingerprint=None) -> None:
+        digest, signature = fingerprint or self.dedup_index.fingerprint(text)
+        self.dedup_index.add(source_id, digest, signature, rows)
+        for row in rows:
+            self._row_sources[row] = source_id
+
+    def add(self, content: str, metadata: Optional[dict] = None) -> str:
+        """Store and index a document, returning its ID."""
+        return self.add_many([(content, metadata)])[0]
+
+    def add_many(self, items: List[Tuple[str, Optional[dict]]]) -> List[str]:
+        """
+        Store and index a batch of (content, metadata) pairs, returning their
+        IDs. Embedding, the vector append and the disk write happen once per
+        batch rather than once per document.
+        """
+        if not items:
+            return []
+        vectors = self.embedding_function([content for content, _ in items])
+
+        with self.storage.write_lock() if self.storage else nullcontext():
+            self.refresh()
+            first_index = len(self.documents)
+            doc_ids = [f"doc-{first_index + i}" for i in range(len(items))]
+
+            # Vector rows first, on disk: the document append is the commit point
+            self.vector_index.add(vectors)
+            if self.storage is not None:
+                self.storage.vectors.flush()
+            self.documents.extend([
+                {
+                    "id": doc_id,
+                    "content": content,
+                    "metadata": metadata or {}
+                }
+                for doc_id, (content, metadata) in zip(doc_ids, items)
+            ])
+
+        if self._keyword_warm:
+            self._sync_keyword_index()
+        if self._metadata_warm:
+            self._sync_metadata_index()
+        self.sync_ann_index()
+
+        auto_rows = settings.ann_auto_build_rows
+        if auto_rows and len(self) >= auto_rows and self.ann_index is None and not self.ann_building:
+            self.build_ann_index()
+
+        return doc_ids
+
+    def ingest(self, documents: List[PreparedDocument], dedup: str = "skip") -> List[dict]:
+        """
+        Add documents with duplicate handling, returning one result per
+        document in input order.
+
+        ``dedup`` decides what happens when a document's normalised text
+        hash matches a stored one, or its MinHash similarity is above the
+        near-duplicate threshold (duplicates within the batch count too):
+
+        - skip: do not store it; report the existing source
+        - replace: tombstone the existing source's rows and store the new one
+        - keep: store it anyway
+        """
+        if dedup == "keep" and self.dedup_index is None:
+            # Nothing to compare against; fingerprints are computed lazily
+            # if a later ingest asks for deduplication.
+            return self._store(documents, [None] * len(documents))
+
+        self.refresh()
+        self._sync_dedup_index()
+
+        results: List[Optional[dict]] = [None] * len(documents)
+        fingerprints = [None] * len(documents)
+        replaced_rows: List[int] = []
+
+        for position, (text, _, _) in enumerate(documents):
+            fingerprint = self.dedup_index.fingerprint(text)
+            match = self.dedup_index.find(*fingerprint) if dedup != "keep" else None
+
+            if match is not None:
+                source_id, kind = match
+                if dedup == "skip":
+                    results[position] = {"status": "duplicate", "duplicate_of": source_id, "match": kind}
+                    continue
+                if source_id.startswith("pending-"):
+                    # Earlier document in this same batch
+                    earlier = int(source_id.split("-", 1)[1])
+                    if results[earlier] and "replaced" in results[earlier]:
+                        # Inherit the stored document the earlier one replaced
+                        results[position] = results[earlier]
+                    results[earlier] = {"status": "superseded", "superseded_by": position}
+                    fingerprints[earlier] = None
+                else:
+                    replaced_rows.extend(self.dedup_index.rows(source_id))
+                    results[position] = {"replaced": source_id, "match": kind}
+                self.dedup_index.remove(source_id)
+
+            fingerprints[position] = fingerprint
+            self.dedup_index.add(f"pending-{position}", *fingerprint, [])
+
+        self.delete_rows(replaced_rows)
+
+        to_store = [i for i, fp in enumerate(fingerprints) if fp is not None]
+        for position in to_store:
+            self.dedup_index.remove(f"pending-{position}")
+        stored = self._store([documents[i] for i in to_store], [fingerprints[i] for i in to_store])
+        for position, result in zip(to_store, stored):
+            results[position] = {**result, **(results[position] or {})}
+
+        def stored_id(position: int) -> str:
+            # Follow in-batch replacements to the document that was kept
+            while results[position].get("status") == "superseded":
+                position = results[position]["superseded_by"]
+            return results[position]["document_id"]
+
+        for result in results:
+            if result.get("status") == "superseded":
+                result["superseded_by"] = stored_id(result["superseded_by"])
+            elif result.get("status") == "duplicate" and result["duplicate_of"].startswith("pending-"):
+                result["duplicate_of"] = stored_id(int(result["duplicate_of"].split("-", 1)[1]))
+        return results
+
+    def _store(self, documents: List[PreparedDocument], fingerprints: list) -> List[dict]:
+        rows = [row for _, _, doc_rows in documents for row in doc_rows]
+        doc_ids = self.add_many(rows)
+        if not doc_ids:
+            return []
+
+        # add_many commits its rows contiguously; fingerprint anything other
+        # workers committed just before them first
+        first_row = int(doc_ids[0].split("-", 1)[1])
+        if self.dedup_index is not None:
+            self._sync_dedup_index(stop=first_row)
+
+        results = []
+        cursor = 0
+        for (text, parent_id, doc_rows), fingerprint in zip(documents, fingerprints):
+            ids = doc_ids[cursor:cursor + len(doc_rows)]
+            row_numbers = list(range(first_row + cursor, first_row + cursor + len(doc_rows)))
+            cursor += len(doc_rows)
+
+            source_id = parent_id or ids[0]
+            if self.dedup_index is not None and fingerprint is not None:
+                self._register_source(source_id, text, row_numbers, fingerprint)
+
+            result = {"status": "added", "document_id": source_id}
+            if parent_id:
+                result["chunk_ids"] = ids
+            results.append(result)
+
+        if self.dedup_index is not None:
+            self._dedup_indexed = first_row + len(rows)
+        return results
+
+    @property
+    def ann_building(self) -> bool:
+        return self._ann_thread is not None and self._ann_thread.is_alive()
+
+    def build_ann_index(self, n_lists: Optional[int] = None, background: bool = True) -> None:
+        """
+        Train an IVF index over the current rows. In the background the
+        build runs on a thread (NumPy releases the GIL for the heavy
+        matrix products) and is swapped in by the next query or insert;
+        rows added meanwhile are bucketed at that point.
+        """
+        if self.ann_building:
+            return
+        vectors = self.vector_index.vectors
+        self._ann_error = None
+
+        def build() -> None:
+            try:
+                self._ann_built = IVFIndex.build(vectors, n_lists)
+            except Exception as e:
+                self._ann_error = str(e)
+                print(f"ANN build failed for collection {self.name}: {e}")
+
+        if background:
+            self._ann_thread = threading.Thread(target=build, name=f"ann-build-{self.name}", daemon=True)
+            self._ann_thread.start()
+        else:
+            build()
+            self.sync_ann_index()
+
+    def sync_ann_index(self) -> None:
+        """Install a finished build and bucket any rows it has not seen."""
+        if self._ann_built is not None:
+            self.ann_index, self._ann_built = self._ann_built, None
+            if self.storage is not None:
+                self.storage.save_centroids(self.ann_index.centroids)
+        elif self.ann_index is None and self.storage is not None and not self.ann_building:
+            # Built by another worker, or before a restart
+            centroids = self.storage.load_centroids()
+            if centroids is not None:
+                self.ann_index = IVFIndex(centroids)
+
+        if self.ann_index is not None and self.ann_index.n_rows < len(self.vector_index):
+            start = self.ann_index.n_rows
+            self.ann_index.add(self.vector_index.vectors[start:], start)
+
+    def ann_status(self) -> dict:
+        if self.ann_building:
+            status = "building"
+        elif self.ann_index is not None or self._ann_built is not None:
+            status = "ready"
+        else:
+            status = "none"
+        info = {"status": status, "rows": len(self.vector_index)}
+        if self.ann_index is not None:
+            info["index"] = self.ann_index.stats()
+        if self._ann_error:
+            info["error"] = self._ann_error
+        return info
+
+    def _keyword_search(
+        self,
+        query: str,
+        n_results: int,
+        allowed: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        self._sync_keyword_index()
+        allowed_set = set(allowed.tolist()) if allowed is not None else None
+        return self.keyword_index.search(query, n_results, allowed_set)
+
+    @property
+    def precision(self) -> str:
+        return self.vector_index.precision
+
+    def _vector_search(
+        self,
+        query: str,
+        n_results: int,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        allowed: Optional[np.ndarray] = None,
+        rerank: bool = False,
+    ) -> List[Tuple[int, float]]:
+        query_vector = self.embedding_function([query])[0]
+        self.sync_ann_index()
+        exclude = self._deleted_sorted if len(self._deleted_sorted) else None
+
+        rerank = rerank and self.precision != "float32"
+        fetch = n_results * RERANK_FACTOR if rerank else n_results
+        if allowed is not None and (exact or self.ann_index is None or len(allowed) <= FILTER_EXACT_ROWS):
+            # Filter rows are already live; score just those
+            hits = self.vector_index.search(query_vector, fetch, rows=allowed)
+        elif self.ann_index is not None and not exact:
+            hits = self.ann_index.search(self.vector_index, query_vector, fetch, nprobe, exclude, allowed)
+        else:
+            hits = self.vector_index.search(query_vector, fetch, exclude=exclude)
+
+        if rerank and hits:
+            # Full-precision vectors are not kept, so re-embed the candidates
+            full_vectors = self.embedding_function([self.documents[row]["content"] for row, _ in hits])
+            hits = rerank_exact(hits, query_vector, full_vectors, n_results)
+        return hits
+
+    def _hybrid_search(
+        self,
+        query: str,
+        n_results: int,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        allowed: Optional[np.ndarray] = None,
+        rerank: bool = False,
+    ) -> List[Tuple[int, float]]:
+        # Fuse both rankings with reciprocal rank fusion over a wider pool
+        pool = n_results * 4
+        fused: Dict[int, float] = {}
+        rankings = (
+            self._keyword_search(query, pool, allowed),
+            self._vector_search(query, pool, nprobe, exact, allowed, rerank),
+        )
+        for ranking in rankings:
+            for rank, (doc_index, _) in enumerate(ranking):
+                fused[doc_index] = fused.get(doc_index, 0.0) + 1.0 / (RRF_K + rank + 1)
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+    def query(
+        self,
+        query: str,
+        n_results: int = 5,
+        mode: str = "keyword",
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        collapse_duplicates: bool = True,
+        where: Optional[dict] = None,
+        rerank: bool = False,
+    ) -> List[dict]:
+        """
+        Return the top documents for ``query`` with their scores.
+        ``nprobe`` and ``exact`` tune vector search when an ANN index exists.
+        With ``collapse_duplicates`` near-duplicate hits are folded into the
+        best-ranked one. ``where`` restricts ranking to rows whose metadata
+        matches (see MetadataIndex.match). ``rerank`` re-scores the top
+        candidates of a quantized collection at full precision.
+        """
+        self.refresh()
+
+        allowed = self.filter_rows(where) if where else None
+        if allowed is not None and len(allowed) == 0:
+            return []
+
+        # Over-fetch so collapsing duplicates still leaves n_results hits
+        fetch = n_results * 3 if collapse_duplicates else n_results
+        if mode == "vector":
+            hits = self._vector_search(query, fetch, nprobe, exact, allowed, rerank)
+        elif mode == "hybrid":
+            hits = self._hybrid_search(query, fetch, nprobe, exact, allowed, rerank)
+        else:
+            hits = self._keyword_search(query, fetch, allowed)
+
+        results = [{**self.documents[doc_index], "score": score} for doc_index, score in hits]
+        if collapse_duplicates:
+            keep = collapse_near_duplicates([r["content"] for r in results], self.hasher)
+            results = [results[i] for i in keep]
+        return results[:n_results]
+
+    @classmethod
+    def open_persistent(
+        cls,
+        root: str,
+        name: str,
+        embedding_function: Optional[EmbeddingFunction] = None,
+        create: bool = True,
+        precision: str = "float32",
+    ) -> Optional["Collection"]:
+        """
+        Open (or create) a collection stored under ``root``. ``precision``
+        only applies when the collection is created.
+        """
+        embedding_function = embedding_function or get_embedding_function()
+        if create:
+            dim = embedding_function([""]).shape[1]
+            embedder = getattr(embedding_function, "name", type(embedding_function).__name__)
+            storage = open_or_create_storage(root, name, dim, embedder, precision)
+        else:
+            storage = open_existing_storage(root, name)
+            if storage is None:
+                return None
+        return cls(name, embedding_function, storage)
+
+    def benchmark_precision(self, k: int = 10, n_queries: int = 100, sample_rows: int = 20000) -> dict:
+        """
+        Memory vs recall@k of each storage precision, using full-precision
+        embeddings of up to ``sample_rows`` live documents as the reference.
+        """
+        self.refresh()
+        live = np.setdiff1d(np.arange(len(self.documents)), self._deleted_sorted, assume_unique=True)
+        if len(live) > sample_rows:
+            live = np.sort(np.random.default_rng(0).choice(live, size=sample_rows, replace=False))
+        reference = (
+            self.embedding_function([self.documents[int(row)]["content"] for row in live])
+            if len(live) else np.empty((0, self.vector_index.dim or 0), dtype=np.float32)
+        )
+        report = benchmark_precision(reference, k, n_queries, RERANK_FACTOR)
+        report["collection_precision"] = self.precision
+        report["collection_rows"] = len(self.vector_index)
+        report["collection_vector_mb"] = round(self.vector_index.memory_bytes() / 2**20, 3)
+        return report
+
+    def close(self) -> None:
+        if self.storage is not None:
+            self.storage.close()
+
+    def destroy(self) -> None:
+        if self.storage is not None:
+            self.storage.destroy()
+
+
+def _rebuild_source_text(rows: List[dict]) -> str:
+    """Reassemble a chunked source from its rows' recorded offsets."""
+    if len(rows) == 1:
+        return rows[0]["content"]
+    parts = []
+    end = 0
+    for row in rows:
+        start = row["metadata"].get("chunk_start", end)
+        # Skip the overlap already covered by the previous chunk
+        parts.append(row["content"][max(0, end - start):])
+        end = row["metadata"].get("chunk_end", start + len(row["content"]))
+        parts.append(" ")
+    return "".join(parts)
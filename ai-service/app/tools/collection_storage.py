@@ -0,0 +1,328 @@
+import fcntl
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from app.tools.vector_index import VectorIndex, storage_dtype
+
+MANIFEST_VERSION = 1
+
+# documents.idx holds one (offset, length) int64 pair per document
+_INDEX_RECORD = np.dtype([("offset", "<i8"), ("length", "<i8")])
+
+
+class SegmentDocuments:
+    """
+    Append-only document segment.
+
+    Each document is one JSON line in ``documents.seg``; ``documents.idx``
+    records where it starts and how long it is. The index file is written
+    after the segment, so its size is the number of committed documents;
+    both are fsynced before ``extend`` returns.
+    Texts stay on disk and are read back with ``os.pread`` on access.
+    """
+
+    def __init__(self, directory: Path):
+        self.segment_path = directory / "documents.seg"
+        self.index_path = directory / "documents.idx"
+        self.segment_path.touch(exist_ok=True)
+        self.index_path.touch(exist_ok=True)
+        self._fd = os.open(self.segment_path, os.O_RDONLY)
+        self._records = np.empty(0, dtype=_INDEX_RECORD)
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, doc_index: int) -> dict:
+        offset, length = self._records[doc_index]
+        return json.loads(os.pread(self._fd, int(length), int(offset)))
+
+    def __iter__(self) -> Iterator[dict]:
+        for doc_index in range(len(self)):
+            yield self[doc_index]
+
+    def committed_count(self) -> int:
+        return os.path.getsize(self.index_path) // _INDEX_RECORD.itemsize
+
+    def reload(self) -> None:
+        """Pick up documents committed by other processes."""
+        count = self.committed_count()
+        if count != len(self._records):
+            self._records = np.fromfile(self.index_path, dtype=_INDEX_RECORD, count=count)
+
+    def extend(self, documents: List[dict]) -> None:
+        """Append documents. Callers must hold the storage write lock."""
+        payloads = [
+            (json.dumps(doc, ensure_ascii=False) + "\n").encode("utf-8")
+            for doc in documents
+        ]
+        records = np.empty(len(payloads), dtype=_INDEX_RECORD)
+
+        with open(self.segment_path, "ab") as segment:
+            offset = segment.tell()
+            for i, payload in enumerate(payloads):
+                records[i] = (offset, len(payload))
+                offset += len(payload)
+            segment.write(b"".join(payloads))
+            segment.flush()
+            os.fsync(segment.fileno())
+
+        with open(self.index_path, "ab") as index:
+            index.write(records.tobytes())
+            index.flush()
+            os.fsync(index.fileno())
+
+        self._records = np.concatenate([self._records, records])
+
+    def append(self, document: dict) -> None:
+        self.extend([document])
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+# Vector file per storage precision; int8 rows also keep a scales file
+_VECTOR_FILES = {"float32": "vectors.f32", "float16": "vectors.f16", "int8": "vectors.i8"}
+
+
+class MappedVectorIndex(VectorIndex):
+    """
+    VectorIndex whose matrix is a shared ``numpy.memmap`` over the vector
+    file for its precision (plus ``vector_scales.f32`` for int8).
+
+    Growing the index extends the files geometrically and remaps them, so
+    every worker process that opens the collection shares the same page cache.
+    """
+
+    def __init__(self, directory: Path, dim: int, precision: str = "float32"):
+        super().__init__(dim, precision)
+        self.path = directory / _VECTOR_FILES[precision]
+        self.path.touch(exist_ok=True)
+        self.scales_path = directory / "vector_scales.f32" if precision == "int8" else None
+        if self.scales_path is not None:
+            self.scales_path.touch(exist_ok=True)
+        self._map(self._file_capacity())
+
+    def _file_capacity(self) -> int:
+        capacity = os.path.getsize(self.path) // (self.dim * self.dtype.itemsize)
+        if self.scales_path is not None:
+            capacity = min(capacity, os.path.getsize(self.scales_path) // 4)
+        return capacity
+
+    def _map(self, capacity: int) -> None:
+        if capacity == 0:
+            self._matrix = np.empty((0, self.dim), dtype=self.dtype)
+            self._scales = np.empty(0, dtype=np.float32)
+            return
+        self._matrix = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        if self.scales_path is not None:
+            self._scales = np.memmap(self.scales_path, dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def _grow(self, required: int) -> None:
+        capacity = max(self._file_capacity(), self.MIN_CAPACITY)
+        while capacity < required:
+            capacity *= 2
+        if capacity > self._file_capacity():
+            # Scales first: the vector file size alone never implies rows
+            # whose scales are missing
+            if self.scales_path is not None:
+                with open(self.scales_path, "r+b") as f:
+                    f.truncate(capacity * 4)
+            with open(self.path, "r+b") as f:
+                f.truncate(capacity * self.dim * self.dtype.itemsize)
+        self._map(capacity)
+
+    def sync(self, size: int) -> None:
+        """Adopt rows committed by other processes."""
+        if size > self.capacity:
+            self._map(self._file_capacity())
+        self._size = size
+
+    def flush(self) -> None:
+        """
+        Write mapped rows to disk, and the file sizes set by ``_grow`` with
+        them. Callers flush before committing the documents that use the rows.
+        """
+        for array in (self._matrix, self._scales):
+            if isinstance(array, np.memmap):
+                array.flush()
+        for path in (self.scales_path, self.path):
+            if path is not None:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+
+class CollectionStorage:
+    """
+    On-disk layout of one collection under ``settings.chroma_persist_dir``::
+
+        <root>/<collection>/manifest.json   name, dimension, dtype, creation token
+        <root>/<collection>/documents.seg   append-only JSON lines
+        <root>/<collection>/documents.idx   (offset, length) per document
+        <root>/<collection>/vectors.f32     rows, memory-mapped (.f16 / .i8 for
+                                            float16 / int8 collections)
+        <root>/<collection>/vector_scales.f32  per-row scales of int8 vectors
+        <root>/<collection>/deleted.idx     int64 row numbers of deleted documents
+        <root>/<collection>/ivf_centroids.npy  ANN centroids, if an index was built
+        <root>/<collection>/.lock           writer lock (flock)
+    """
+
+    def __init__(self, directory: Path, manifest: dict):
+        self.directory = directory
+        self.manifest = manifest
+        self.documents = SegmentDocuments(directory)
+        self.vectors = MappedVectorIndex(directory, manifest["dim"], manifest.get("dtype", "float32"))
+        self.vectors.sync(len(self.documents))
+        self.deleted_path = directory / "deleted.idx"
+        self.deleted_path.touch(exist_ok=True)
+        self.deleted_rows = np.empty(0, dtype=np.int64)
+        self._reload_deleted()
+
+    @property
+    def token(self) -> str:
+        return self.manifest["token"]
+
+    @staticmethod
+    def manifest_path(directory: Path) -> Path:
+        return directory / "manifest.json"
+
+    @classmethod
+    def exists(cls, directory: Path) -> bool:
+        return cls.manifest_path(directory).is_file()
+
+    @classmethod
+    def open(cls, directory: Path) -> "CollectionStorage":
+        manifest = json.loads(cls.manifest_path(directory).read_text())
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported collection manifest version in {directory}")
+        return cls(directory, manifest)
+
+    @classmethod
+    def create(
+        cls,
+        directory: Path,
+        name: str,
+        dim: int,
+        embedder: str,
+        precision: str = "float32",
+    ) -> "CollectionStorage":
+        storage_dtype(precision)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "name": name,
+            "dim": dim,
+            "dtype": precision,
+            "embedder": embedder,
+            "token": uuid.uuid4().hex,
+        }
+        # Write a temp file and hard-link it into place: readers never see a
+        # half-written manifest, and if another worker created the collection
+        # first the link fails and we open theirs instead.
+        tmp_path = directory / f"manifest.{manifest['token']}.tmp"
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        try:
+            os.link(tmp_path, cls.manifest_path(directory))
+        except FileExistsError:
+            return cls.open(directory)
+        finally:
+            tmp_path.unlink()
+        return cls(directory, manifest)
+
+    @contextmanager
+    def write_lock(self):
+        with open(self.directory / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def is_current(self) -> bool:
+        """False once the collection was deleted or recreated by another process."""
+        try:
+            manifest = json.loads(self.manifest_path(self.directory).read_text())
+        except (OSError, ValueError):
+            return False
+        return manifest.get("token") == self.token
+
+    @property
+    def centroids_path(self) -> Path:
+        return self.directory / "ivf_centroids.npy"
+
+    def save_centroids(self, centroids: np.ndarray) -> None:
+        tmp_path = self.directory / f"ivf_centroids.{uuid.uuid4().hex}.tmp.npy"
+        np.save(tmp_path, centroids)
+        os.replace(tmp_path, self.centroids_path)
+
+    def load_centroids(self) -> Optional[np.ndarray]:
+        if not self.centroids_path.is_file():
+            return None
+        return np.load(self.centroids_path)
+
+    def _reload_deleted(self) -> None:
+        count = os.path.getsize(self.deleted_path) // 8
+        if count != len(self.deleted_rows):
+            self.deleted_rows = np.fromfile(self.deleted_path, dtype="<i8", count=count)
+
+    def append_deleted(self, rows: List[int]) -> None:
+        """Tombstone rows. Callers must hold the write lock."""
+        with open(self.deleted_path, "ab") as f:
+            f.write(np.asarray(rows, dtype="<i8").tobytes())
+        self._reload_deleted()
+
+    def refresh(self) -> None:
+        self.documents.reload()
+        self.vectors.sync(len(self.documents))
+        self._reload_deleted()
+
+    def close(self) -> None:
+        self.documents.close()
+
+    def destroy(self) -> None:
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def collection_directory(root: str, name: str) -> Path:
+    return Path(root) / name
+
+
+def open_or_create_storage(
+    root: str,
+    name: str,
+    dim: int,
+    embedder: str,
+    precision: str = "float32",
+) -> CollectionStorage:
+    """
+    Open a collection, creating it if needed. ``precision`` only applies
+    to new collections; an existing one keeps the precision it was built with.
+    """
+    directory = collection_directory(root, name)
+    if CollectionStorage.exists(directory):
+        storage = CollectionStorage.open(directory)
+        if storage.manifest["dim"] != dim:
+            raise ValueError(
+                f"Collection '{name}' was built with {storage.manifest['dim']}-dimensional "
+                f"embeddings but the current embedder produces {dim}"
+            )
+        return storage
+    return CollectionStorage.create(directory, name, dim, embedder, precision)
+
+
+def open_existing_storage(root: str, name: str) -> Optional[CollectionStorage]:
+    directory = collection_directory(root, name)
+    if not CollectionStorage.exists(directory):
+        return None
+    return CollectionStorage.open(directory)
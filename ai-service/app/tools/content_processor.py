@@ -1,98 +1,215 @@
+import asyncio
 import base64
-from typing import List
-from io import BytesIO
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
+from app.config import settings
 from app.models import ContentSource
+from app.tools.extraction_cache import extract_pdf_by_digest, extract_pdf_cached
+from app.tools.html_text import StreamingTextExtractor
+from app.tools.http_fetcher import get_http_fetcher
+from app.tools.single_flight import get_single_flight
+from app.tools.uploads import PdfUpload
+from app.tools.youtube import extract_video_id, get_transcript
 
+# A JSON content source or a PDF uploaded as a multipart file
+SourceInput = Union[ContentSource, PdfUpload]
 
-async def process_content_sources(sources: List[ContentSource]) -> str:
+
+@dataclass
+class SourceResult:
+    """Outcome of processing one content source."""
+    index: int  # position in the request's source list
+    type: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+    details: Optional[dict] = None  # e.g. bytes read and parse time for URLs
+
+
+async def _process_source(result: SourceResult, source: SourceInput, max_chars: Optional[int] = None) -> Optional[str]:
+    if isinstance(source, PdfUpload):
+        return await extract_pdf_upload_text(source, max_chars)
+    if source.type == "pdf" and source.data:
+        return await extract_pdf_text(source.data, max_chars)
+    if source.type == "youtube" and source.url:
+        return await get_youtube_transcript(source.url)
+    if source.type == "text" and source.content:
+        return source.content
+    if source.type == "url" and source.url:
+        try:
+            text, result.details = await scrape_url(source.url, max_chars or URL_TEXT_CHARS)
+            return text
+        except Exception as e:
+            return f"[URL content unavailable: {e}]"
+    return None
+
+
+async def iter_content_sources(
+    sources: List[SourceInput],
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    max_chars: Optional[int] = None,
+) -> AsyncIterator[SourceResult]:
+    """
+    Process sources concurrently and yield each result as soon as it is
+    ready, so callers can start on the first source while slower ones are
+    still loading.
+
+    At most ``max_concurrency`` sources run at once and each gets its own
+    ``timeout``; a failing or slow source yields a result with ``error``
+    set and does not affect the others. ``max_chars`` caps the text kept
+    per source; PDFs stop parsing once they reach it.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or settings.content_source_concurrency)
+    timeout = timeout or settings.content_source_timeout_seconds
+
+    async def run(index: int, source: SourceInput) -> SourceResult:
+        async with semaphore:
+            start = time.perf_counter()
+            result = SourceResult(index=index, type=source.type)
+            try:
+                result.text = await asyncio.wait_for(_process_source(result, source, max_chars), timeout)
+                if result.text and max_chars is not None:
+                    result.text = result.text[:max_chars]
+            except asyncio.TimeoutError:
+                result.error = f"timed out after {timeout:g}s"
+            except Exception as e:
+                result.error = str(e)
+            result.elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            if result.error:
+                print(f"Error processing {source.type}: {result.error}")
+            return result
+
+    tasks = [asyncio.create_task(run(i, source)) for i, source in enumerate(sources)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # The caller stopped early (or was cancelled); drop remaining work
+        for task in tasks:
+            task.cancel()
+
+
+async def process_content_sources(
+    sources: List[SourceInput],
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    max_chars: Optional[int] = None,
+) -> str:
     """
     Process various content sources and extract text for RAG.
+
+    Sources are fetched concurrently (see iter_content_sources) but the
+    text is joined in request order.
     """
-    all_text = []
-    
-    for source in sources:
-        try:
-            if source.type == "pdf" and source.data:
-                text = await extract_pdf_text(source.data)
-                all_text.append(text)
-                
-            elif source.type == "youtube" and source.url:
-                text = await get_youtube_transcript(source.url)
-                all_text.append(text)
-                
-            elif source.type == "text" and source.content:
-                all_text.append(source.content)
-                
-            elif source.type == "url" and source.url:
-                text = await scrape_url_content(source.url)
-                all_text.append(text)
-                
-        except Exception as e:
-            print(f"Error processing {source.type}: {e}")
-            continue
-    
-    return "\n\n".join(all_text)
+    results = [
+        result async for result in iter_content_sources(sources, max_concurrency, timeout, max_chars)
+    ]
+    return join_source_texts(results)
+
 
+def join_source_texts(results: List[SourceResult]) -> str:
+    """Text of the successful results, in request order."""
+    results = sorted(results, key=lambda result: result.index)
+    return "\n\n".join(result.text for result in results if result.text)
 
-async def extract_pdf_text(pdf_base64: str) -> str:
-    """Extract text from base64 encoded PDF."""
+
+async def extract_pdf_text(pdf_base64: str, max_chars: Optional[int] = None) -> str:
+    """Extract text from base64 encoded PDF, up to roughly ``max_chars``."""
     try:
-        from PyPDF2 import PdfReader
-        
-        pdf_bytes = base64.b64decode(pdf_base64)
-        reader = PdfReader(BytesIO(pdf_bytes))
-        
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        
-        return text
+        # PDF parsing is CPU-bound; it runs in the shared process pool
+        return await extract_pdf_cached(base64.b64decode(pdf_base64), max_chars=max_chars)
+    except Exception as e:
+        return f"[PDF content - extraction failed: {e}]"
+
+
+async def extract_pdf_upload_text(upload: PdfUpload, max_chars: Optional[int] = None) -> str:
+    """Extract text from a PDF uploaded as a multipart file."""
+    try:
+        return await extract_pdf_by_digest(upload.digest, upload.read, max_chars)
     except Exception as e:
         return f"[PDF content - extraction failed: {e}]"
 
 
 async def get_youtube_transcript(url: str) -> str:
-    """Get transcript from YouTube video."""
+    """Get transcript from YouTube video (cached by video ID, see app.tools.youtube)."""
     try:
-        from youtube_transcript_api import YouTubeTranscriptApi
-        
-        # Extract video ID
-        if "youtube.com/watch?v=" in url:
-            video_id = url.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in url:
-            video_id = url.split("youtu.be/")[1].split("?")[0]
-        else:
+        video_id = extract_video_id(url)
+        if video_id is None:
             return "[Invalid YouTube URL]"
         
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        text = " ".join([entry["text"] for entry in transcript])
-        
-        return text
+        return await get_transcript(video_id)
     except Exception as e:
         return f"[YouTube transcript unavailable: {e}]"
 
 
-async def scrape_url_content(url: str) -> str:
-    """Scrape content from a URL."""
+# Characters kept from a URL source when the caller sets no budget
+URL_TEXT_CHARS = 5000
+
+
+async def scrape_url(url: str, max_chars: int = URL_TEXT_CHARS) -> Tuple[str, dict]:
+    """
+    Stream a page through StreamingTextExtractor, closing the response as
+    soon as ``max_chars`` characters of text have been collected. Returns
+    the text and a report of bytes read and parse time.
+
+    The text is cached per (url, max_chars) for as long as the page is
+    fresh, so a page cut short is not downloaded again on the next call.
+    Concurrent scrapes of the same URL and budget share one request.
+    """
+    return await get_single_flight("url").do(f"{max_chars}:{url}", lambda: _scrape_url(url, max_chars))
+
+
+async def _scrape_url(url: str, max_chars: int) -> Tuple[str, dict]:
+    fetcher = get_http_fetcher()
+    # Pages cut short at max_chars never reach the body cache, so the text is cached per budget
+    variant = f"text:{max_chars}"
+    cached = await fetcher.load_text(url, variant)
+    if cached is not None:
+        return cached["text"], {
+            "url": url,
+            "status_code": cached["status_code"],
+            "bytes_read": 0,
+            "parse_ms": 0.0,
+            "chars": len(cached["text"]),
+            "stopped_early": False,
+            "from_cache": True,
+        }
+
+    parse_seconds = 0.0
+    async with fetcher.stream(url) as body:
+        extractor = StreamingTextExtractor(max_chars, body.encoding)
+        async for chunk in body.iter_bytes():
+            start = time.perf_counter()
+            await asyncio.to_thread(extractor.feed_bytes, chunk)
+            parse_seconds += time.perf_counter() - start
+            if extractor.done:
+                break
+
+    text = extractor.text()
+    await fetcher.store_text(body, variant, text)
+    report = {
+        "url": url,
+        "status_code": body.status_code,
+        "bytes_read": body.bytes_read,
+        "parse_ms": round(parse_seconds * 1000, 1),
+        "chars": len(text),
+        "stopped_early": not body.complete,
+        "from_cache": body.from_cache or body.revalidated,
+    }
+    print(
+        f"Scraped {url}: {report['bytes_read']} bytes read, {report['chars']} chars "
+        f"in {report['parse_ms']} ms{' (stopped early)' if report['stopped_early'] else ''}"
+    )
+    return text, report
+
+
+async def scrape_url_content(url: str, max_chars: int = URL_TEXT_CHARS) -> str:
+    """Scrape content from a URL via the shared, disk-cached HTTP fetcher."""
     try:
-        import requests
-        from bs4 import BeautifulSoup
-        
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        # Remove scripts and styles
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        text = soup.get_text()
-        
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = "\n".join(chunk for chunk in chunks if chunk)
-        
-        return text[:5000]  # Limit length
+        text, _ = await scrape_url(url, max_chars)
+        return text
     except Exception as e:
         return f"[URL content unavailable: {e}]"
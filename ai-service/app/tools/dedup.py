@@ -0,0 +1,144 @@
+import hashlib
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.tools.inverted_index import tokenize
+
+# Jaccard similarity above which two documents count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+
+def content_hash(text: str) -> str:
+    """Hash of the text with case and whitespace normalised."""
+    return hashlib.sha256(" ".join(tokenize(text)).encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, using multiply-shift hashing."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        n = self.shingle_size
+        shingles = {" ".join(tokens[i:i + n]) for i in range(max(1, len(tokens) - n + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # uint64 arithmetic wraps, which is exactly what multiply-shift wants
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(a == b))
+
+
+class DuplicateIndex:
+    """
+    Exact (content hash) and near-duplicate (MinHash + LSH banding) lookup
+    over the sources stored in a collection. A source is one ingested
+    document, which may span several chunk rows.
+    """
+
+    def __init__(
+        self,
+        hasher: Optional[MinHasher] = None,
+        bands: int = 16,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    ):
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows_per_band = self.hasher.num_perm // bands
+        self.threshold = threshold
+
+        self._by_hash: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+        self._sources: Dict[str, Tuple[str, np.ndarray, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def __contains__(self, source_id: str) -> bool:
+        return source_id in self._sources
+
+    def fingerprint(self, text: str) -> Tuple[str, np.ndarray]:
+        return content_hash(text), self.hasher.signature(text)
+
+    def _band_keys(self, signature: np.ndarray):
+        r = self.rows_per_band
+        for band in range(self.bands):
+            yield band, signature[band * r:(band + 1) * r].tobytes()
+
+    def find(self, digest: str, signature: np.ndarray) -> Optional[Tuple[str, str]]:
+        """Return (source_id, "exact" | "near") for the closest stored duplicate."""
+        if digest in self._by_hash:
+            return self._by_hash[digest], "exact"
+
+        candidates: Set[str] = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best, best_similarity = None, self.threshold
+        for source_id in candidates:
+            similarity = estimate_similarity(signature, self._sources[source_id][1])
+            if similarity >= best_similarity:
+                best, best_similarity = source_id, similarity
+        return (best, "near") if best is not None else None
+
+    def add(self, source_id: str, digest: str, signature: np.ndarray, rows: List[int]) -> None:
+        self._by_hash.setdefault(digest, source_id)
+        for key in self._band_keys(signature):
+            self._buckets[key].add(source_id)
+        self._sources[source_id] = (digest, signature, rows)
+
+    def rows(self, source_id: str) -> List[int]:
+        return self._sources[source_id][2]
+
+    def remove(self, source_id: str) -> None:
+        digest, signature, _ = self._sources.pop(source_id)
+        if self._by_hash.get(digest) == source_id:
+            del self._by_hash[digest]
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(source_id)
+                if not bucket:
+                    del self._buckets[key]
+
+
+def collapse_near_duplicates(
+    texts: List[str],
+    hasher: MinHasher,
+    threshold: float = NEAR_DUPLICATE_THRESHOLD,
+) -> List[int]:
+    """
+    Indexes of ``texts`` to keep, in order, dropping any text that is a
+    near-duplicate of one already kept.
+    """
+    kept: List[int] = []
+    kept_fingerprints: List[Tuple[str, np.ndarray]] = []
+    for i, text in enumerate(texts):
+        digest, signature = content_hash(text), hasher.signature(text)
+        if any(
+            digest == kept_digest or estimate_similarity(signature, kept_signature) >= threshold
+            for kept_digest, kept_signature in kept_fingerprints
+        ):
+            continue
+        kept.append(i)
+        kept_fingerprints.append((digest, signature))
+    return kept
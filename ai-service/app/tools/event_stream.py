@@ -0,0 +1,51 @@
+import json
+from dataclasses import asdict, is_dataclass
+from typing import Any, AsyncIterator, Literal, Tuple
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+EventFormat = Literal["sse", "ndjson"]
+
+_MEDIA_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def _jsonable(data: Any) -> Any:
+    if isinstance(data, BaseModel):
+        return data.model_dump()
+    if is_dataclass(data):
+        return asdict(data)
+    return data
+
+
+def encode_event(event: str, data: Any, stream_format: EventFormat = "sse") -> str:
+    """One event as an SSE frame or as an NDJSON line ``{"event", "data"}``."""
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(_jsonable(data))}\n\n"
+    return json.dumps({"event": event, "data": _jsonable(data)}) + "\n"
+
+
+def event_stream_response(
+    events: AsyncIterator[Tuple[str, Any]],
+    stream_format: EventFormat = "sse",
+) -> StreamingResponse:
+    """
+    Stream ``(event, data)`` pairs to the client as they are produced.
+    A failure mid-stream is sent as a final ``error`` event, since the
+    status code has already gone out with the first event.
+    """
+
+    async def body() -> AsyncIterator[str]:
+        try:
+            async for event, data in events:
+                yield encode_event(event, data, stream_format)
+        except Exception as e:
+            print(f"❌ ERROR in event stream: {str(e)}")
+            yield encode_event("error", {"detail": str(e)}, stream_format)
+
+    return StreamingResponse(
+        body(),
+        media_type=_MEDIA_TYPES[stream_format],
+        # Ask proxies not to buffer, or the events arrive all at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
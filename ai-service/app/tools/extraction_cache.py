@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from app.config import settings
+from app.tools.pdf_extractor import extract_pdf, get_pdf_extractor
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of what we derive from uploaded files, keyed on
+    the SHA-256 of the decoded bytes. Each entry holds the extracted
+    ``text`` and, once a resume has been parsed, the ``resume`` fields.
+
+    Lookups go through an in-memory LRU of ``max_entries`` and fall back to
+    ``<directory>/<aa>/<digest>.json``; entries are written to a temp file
+    and renamed into place, so concurrent workers can share the directory.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 256):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def _remember(self, digest: str, entry: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[digest] = entry
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, digest: str) -> Optional[dict]:
+        try:
+            return json.loads(self._path(digest).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, digest: str, entry: dict) -> None:
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False))
+        os.replace(tmp_path, path)
+
+    async def get(self, digest: str) -> dict:
+        """The cached entry for ``digest``, or an empty dict."""
+        entry = self._entries.get(digest)
+        if entry is not None:
+            self._entries.move_to_end(digest)
+            self.stats["memory_hits"] += 1
+            return entry
+
+        entry = await asyncio.to_thread(self._load, digest)
+        if entry is None:
+            self.stats["misses"] += 1
+            return {}
+        self.stats["disk_hits"] += 1
+        self._remember(digest, entry)
+        return entry
+
+    async def update(self, digest: str, **fields) -> None:
+        """Merge ``fields`` into the entry for ``digest`` in both tiers."""
+        current = self._entries.get(digest) or await asyncio.to_thread(self._load, digest) or {}
+        entry = {**current, **fields}
+        self._remember(digest, entry)
+        await asyncio.to_thread(self._save, digest, entry)
+
+
+_cache: Optional[ExtractionCache] = None
+
+
+def get_extraction_cache() -> ExtractionCache:
+    global _cache
+    if _cache is None:
+        _cache = ExtractionCache(settings.extraction_cache_dir, settings.extraction_cache_size)
+    return _cache
+
+
+def _extractor_tag() -> str:
+    # Text extracted under a different page limit is not reused
+    return f"pypdf2:{get_pdf_extractor().max_pages}"
+
+
+def _covers(entry: dict, max_chars: Optional[int]) -> bool:
+    """Whether cached text extracted under its own budget satisfies ``max_chars``."""
+    if entry.get("text") is None or entry.get("extractor") != _extractor_tag():
+        return False
+    budget = entry.get("max_chars")
+    if budget is None or len(entry["text"]) < budget:
+        return True  # the whole document was extracted
+    return max_chars is not None and max_chars <= budget
+
+
+async def extract_pdf_by_digest(
+    digest: str,
+    load_bytes: Callable[[], Awaitable[bytes]],
+    max_chars: Optional[int] = None,
+) -> str:
+    """
+    extract_pdf, reusing the text of any identical file seen before if it
+    was extracted with at least the requested ``max_chars`` budget. The
+    file is only loaded (via ``load_bytes``) on a cache miss.
+    """
+    cache = get_extraction_cache()
+    entry = await cache.get(digest)
+    if _covers(entry, max_chars):
+        return entry["text"]
+
+    text = await extract_pdf(await load_bytes(), max_chars)
+    await cache.update(digest, text=text, extractor=_extractor_tag(), max_chars=max_chars)
+    return text
+
+
+async def extract_pdf_cached(
+    pdf_bytes: bytes,
+    digest: Optional[str] = None,
+    max_chars: Optional[int] = None,
+) -> str:
+    async def load_bytes() -> bytes:
+        return pdf_bytes
+
+    return await extract_pdf_by_digest(digest or content_digest(pdf_bytes), load_bytes, max_chars)
@@ -0,0 +1,93 @@
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import List
+
+# Subtrees whose text is never content
+SKIP_TAGS = {"script", "style", "nav", "noscript", "template", "svg", "iframe", "head"}
+# Tags that end a line of text
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "figcaption", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "li", "main", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Bytes handed to the parser at a time
+_FEED_SLICE = 8192
+
+
+class StreamingTextExtractor(HTMLParser):
+    """
+    Incremental HTML-to-text extractor.
+
+    Fed the document chunk by chunk; text inside SKIP_TAGS is dropped
+    without being collected, block-level tags become line breaks, and
+    ``done`` turns true once ``max_chars`` characters of text have been
+    gathered so the caller can stop reading the response.
+    """
+
+    def __init__(self, max_chars: int = 5000, encoding: str = "utf-8"):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.chars = 0
+        self._decoder = codecs.getincrementaldecoder(_known_encoding(encoding))(errors="replace")
+        self._skip_depth = 0
+        self._lines: List[str] = []
+        self._line: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self.chars >= self.max_chars
+
+    def feed_bytes(self, chunk: bytes) -> None:
+        # Parse in small slices so a large network chunk is abandoned as
+        # soon as the budget is met
+        for start in range(0, len(chunk), _FEED_SLICE):
+            if self.done:
+                return
+            self.feed(self._decoder.decode(chunk[start:start + _FEED_SLICE]))
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>, <hr/>: no subtree to skip
+        if tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        text = _WHITESPACE_RE.sub(" ", data)
+        if text.strip():
+            self._line.append(text)
+            self.chars += len(text)
+
+    def _end_line(self) -> None:
+        line = "".join(self._line).strip()
+        if line:
+            self._lines.append(line)
+        self._line = []
+
+    def text(self) -> str:
+        self._end_line()
+        return "\n".join(self._lines)[:self.max_chars]
+
+
+def _known_encoding(encoding: str) -> str:
+    try:
+        codecs.lookup(encoding)
+        return encoding
+    except LookupError:
+        return "utf-8"
@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.config import settings
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+# Slice size when replaying a cached body as a stream
+_CACHED_CHUNK = 64 * 1024
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status_code: int
+    content: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    from_cache: bool = False  # served from disk without contacting the server
+    revalidated: bool = False  # server answered 304 Not Modified
+
+
+class StreamedBody:
+    """
+    A response body consumed chunk by chunk, from the network or the cache.
+    Readers may stop early; ``complete`` tells whether they saw it all.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        headers: Dict[str, str],
+        chunks: AsyncIterator[bytes],
+        from_cache: bool = False,
+        revalidated: bool = False,
+    ):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.from_cache = from_cache
+        self.revalidated = revalidated
+        self.bytes_read = 0
+        self.complete = False
+        self._chunks = chunks
+
+    @property
+    def encoding(self) -> str:
+        match = _CHARSET_RE.search(self.headers.get("content-type", ""))
+        return match.group(1) if match else "utf-8"
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        async for chunk in self._chunks:
+            self.bytes_read += len(chunk)
+            yield chunk
+        self.complete = True
+
+
+async def _replay(content: bytes) -> AsyncIterator[bytes]:
+    for start in range(0, len(content), _CACHED_CHUNK):
+        yield content[start:start + _CACHED_CHUNK]
+
+
+class HttpCache:
+    """
+    On-disk HTTP response cache. Each URL is stored as ``<sha256>.json``
+    (status, validators, fetch time) plus ``<sha256>.body``; both are
+    written to temp files and renamed into place.
+
+    Text a caller derived from a response (such as the prefix extracted
+    before stopping early) is kept beside it as ``<sha256>.text.json``,
+    keyed on the URL and a caller-chosen ``variant``.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def load(self, url: str) -> Optional[dict]:
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            meta["content"] = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("url") == url else None
+
+    def store(self, url: str, status_code: int, headers: Dict[str, str], content: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _, body_path = self._paths(url)
+        body_tmp = body_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        body_tmp.write_bytes(content)
+        os.replace(body_tmp, body_path)
+        self.touch(url, status_code, headers)
+
+    def _text_path(self, url: str, variant: str) -> Path:
+        key = hashlib.sha256(f"{variant}\n{url}".encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.text.json"
+
+    def load_text(self, url: str, variant: str) -> Optional[dict]:
+        try:
+            entry = json.loads(self._text_path(url, variant).read_text())
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url and entry.get("variant") == variant else None
+
+    def store_text(self, url: str, variant: str, status_code: int, headers: Dict[str, str], text: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        text_path = self._text_path(url, variant)
+        text_tmp = text_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        text_tmp.write_text(json.dumps({
+            "url": url,
+            "variant": variant,
+            "status_code": status_code,
+            "headers": headers,
+            "text": text,
+            "fetched_at": time.time(),
+        }, ensure_ascii=False))
+        os.replace(text_tmp, text_path)
+
+    def touch(self, url: str, status_code: int, headers: Dict[str, str]) -> None:
+        """Rewrite the metadata, restarting the entry's freshness window."""
+        meta_path, _ = self._paths(url)
+        meta_tmp = meta_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        meta_tmp.write_text(json.dumps({
+            "url": url,
+            "status_code": status_code,
+            "headers": headers,
+            "fetched_at": time.time(),
+        }))
+        os.replace(meta_tmp, meta_path)
+
+
+def _cached_headers(response: httpx.Response) -> Dict[str, str]:
+    keep = ("etag", "last-modified", "content-type", "cache-control")
+    return {name: response.headers[name] for name in keep if name in response.headers}
+
+
+def _fresh_for(headers: Dict[str, str], default: float) -> float:
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-cache" in cache_control:
+        return 0.0
+    match = _MAX_AGE_RE.search(cache_control)
+    return float(match.group(1)) if match else default
+
+
+class HttpFetcher:
+    """
+    Shared async HTTP client for scraping.
+
+    One pooled ``httpx.AsyncClient`` is reused across requests, with a cap
+    on concurrent requests per host. GET responses are cached on disk: a
+    fresh entry (Cache-Control max-age, else ``fresh_seconds``) is served
+    without a request, a stale one is revalidated with If-None-Match /
+    If-Modified-Since so unchanged pages cost a 304 instead of a download.
+
+    A body read only partway is not stored, so callers that stop early
+    cache what they extracted with ``store_text`` and check ``load_text``
+    before streaming; such entries follow the same freshness rule but are
+    not revalidated.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_connections: int = 50,
+        per_host_limit: int = 4,
+        timeout: float = 10.0,
+        fresh_seconds: float = 3600.0,
+    ):
+        self.cache = HttpCache(cache_dir)
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.fresh_seconds = fresh_seconds
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "revalidated": 0, "downloaded": 0, "text_hits": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": "ai-service/1.0 (+content-processor)"},
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    @asynccontextmanager
+    async def stream(self, url: str) -> AsyncIterator[StreamedBody]:
+        """
+        Open ``url`` as a StreamedBody, going through the disk cache like
+        ``fetch``. A network body is stored only if the caller read all of
+        it; a reader that stops early simply closes the connection.
+        """
+        self.stats["requests"] += 1
+        cached = await asyncio.to_thread(self.cache.load, url)
+        if cached is not None:
+            age = time.time() - cached["fetched_at"]
+            if age < _fresh_for(cached["headers"], self.fresh_seconds):
+                self.stats["cache_hits"] += 1
+                yield StreamedBody(
+                    url, cached["status_code"], cached["headers"], _replay(cached["content"]), from_cache=True
+                )
+                return
+
+        request_headers = {}
+        if cached is not None:
+            if "etag" in cached["headers"]:
+                request_headers["If-None-Match"] = cached["headers"]["etag"]
+            if "last-modified" in cached["headers"]:
+                request_headers["If-Modified-Since"] = cached["headers"]["last-modified"]
+
+        async with self._host_limit(url):
+            async with self.client.stream("GET", url, headers=request_headers) as response:
+                if response.status_code == 304 and cached is not None:
+                    self.stats["revalidated"] += 1
+                    headers = {**cached["headers"], **_cached_headers(response)}
+                    await asyncio.to_thread(self.cache.touch, url, cached["status_code"], headers)
+                    yield StreamedBody(
+                        url, cached["status_code"], headers, _replay(cached["content"]), revalidated=True
+                    )
+                    return
+
+                self.stats["downloaded"] += 1
+                headers = _cached_headers(response)
+                cacheable = response.status_code == 200 and "no-store" not in headers.get("cache-control", "").lower()
+                received: List[bytes] = []
+
+                async def chunks() -> AsyncIterator[bytes]:
+                    async for chunk in response.aiter_bytes():
+                        if cacheable:
+                            received.append(chunk)
+                        yield chunk
+
+                body = StreamedBody(url, response.status_code, headers, chunks())
+                yield body
+
+        if cacheable and body.complete:
+            await asyncio.to_thread(self.cache.store, url, response.status_code, headers, b"".join(received))
+
+    async def load_text(self, url: str, variant: str) -> Optional[dict]:
+        """The fresh ``store_text`` entry for (url, variant): text, status_code, headers."""
+        entry = await asyncio.to_thread(self.cache.load_text, url, variant)
+        if entry is None or time.time() - entry["fetched_at"] >= _fresh_for(entry["headers"], self.fresh_seconds):
+            return None
+        self.stats["text_hits"] += 1
+        return entry
+
+    async def store_text(self, body: StreamedBody, variant: str, text: str) -> None:
+        """
+        Cache ``text`` derived from ``body`` if the response itself was
+        cacheable. Bodies replayed from a fresh cache entry are skipped, so
+        the text never outlives the response it came from.
+        """
+        if body.from_cache or body.status_code != 200:
+            return
+        if "no-store" in body.headers.get("cache-control", "").lower():
+            return
+        await asyncio.to_thread(self.cache.store_text, body.url, variant, body.status_code, body.headers, text)
+
+    async def fetch(self, url: str) -> FetchResult:
+        async with self.stream(url) as body:
+            content = b"".join([chunk async for chunk in body.iter_bytes()])
+        return FetchResult(url, body.status_code, content, body.headers, body.from_cache, body.revalidated)
+
+
+_fetcher: Optional[HttpFetcher] = None
+
+
+def get_http_fetcher() -> HttpFetcher:
+    """The process-wide fetcher; its client is closed by the app lifespan."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = HttpFetcher(
+            settings.http_cache_dir,
+            settings.http_max_connections,
+            settings.http_per_host_connections,
+            settings.http_timeout_seconds,
+            settings.http_cache_fresh_seconds,
+        )
+    return _fetcher
+
+
+async def close_http_fetcher() -> None:
+    if _fetcher is not None:
+        await _fetcher.close()
@@ -0,0 +1,108 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for both indexing and querying."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    Incremental inverted index with BM25 ranking.
+
+    Postings map each term to {doc_index: term_frequency}. Documents are
+    addressed by their position in the collection, so adding a document is
+    O(tokens in document) and a query only touches the postings of its terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_index: int, text: str) -> None:
+        """Index a single document."""
+        terms = tokenize(text)
+        for term, tf in Counter(terms).items():
+            self.postings[term][doc_index] = tf
+        self.doc_lengths[doc_index] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, doc_index: int, text: str) -> None:
+        """Drop a document previously added with the same text."""
+        if doc_index not in self.doc_lengths:
+            return
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_index, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_index)
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        allowed: Optional[Set[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Return (doc_index, score) pairs for documents containing every query
+        term, best BM25 score first. ``allowed`` restricts the candidates
+        (e.g. to rows passing a metadata filter) before any scoring.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_lengths:
+            return []
+
+        term_postings = []
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                return []
+            term_postings.append(postings)
+
+        # Intersect starting from the rarest term so the candidate set stays small
+        term_postings.sort(key=len)
+        if allowed is not None and len(allowed) < len(term_postings[0]):
+            candidates = {doc_index for doc_index in allowed if doc_index in term_postings[0]}
+        else:
+            candidates = set(term_postings[0])
+            if allowed is not None:
+                candidates.intersection_update(allowed)
+        for postings in term_postings[1:]:
+            candidates.intersection_update(postings)
+            if not candidates:
+                return []
+
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        idf = [
+            math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5))
+            for p in term_postings
+        ]
+
+        def score(doc_index: int) -> float:
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_index] / avg_length)
+            total = 0.0
+            for weight, postings in zip(idf, term_postings):
+                tf = postings[doc_index]
+                total += weight * tf * (self.k1 + 1) / (tf + norm)
+            return total
+
+        return heapq.nlargest(
+            n_results,
+            ((doc_index, score(doc_index)) for doc_index in candidates),
+            key=lambda item: item[1],
+        )
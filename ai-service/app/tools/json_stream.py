@@ -0,0 +1,77 @@
+import codecs
+import json
+from typing import Any, AsyncIterator
+
+_WHITESPACE = " \t\r\n"
+
+
+class JsonStreamError(ValueError):
+    """Raised when a streamed JSON body is malformed or a value is too large."""
+
+
+async def iter_json_values(
+    chunks: AsyncIterator[bytes],
+    max_value_bytes: int = 10 * 1024 * 1024,
+) -> AsyncIterator[Any]:
+    """
+    Incrementally decode a body that is either NDJSON or a single JSON array.
+
+    Values are yielded as soon as they are complete, so memory is bounded by
+    the largest single value (``max_value_bytes``) rather than the body size.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    iterator = chunks.__aiter__()
+    buffer = ""
+    in_array = None  # decided by the first non-whitespace character
+    array_closed = False
+    exhausted = False
+
+    while True:
+        pos = 0
+        while True:
+            while pos < len(buffer) and (buffer[pos] in _WHITESPACE or (in_array and buffer[pos] == ",")):
+                pos += 1
+            if pos == len(buffer):
+                break
+
+            if in_array is None:
+                in_array = buffer[pos] == "["
+                if in_array:
+                    pos += 1
+                    continue
+            if array_closed:
+                raise JsonStreamError("Unexpected data after closing ']'")
+            if in_array and buffer[pos] == "]":
+                array_closed = True
+                pos += 1
+                continue
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if exhausted:
+                    raise JsonStreamError(f"Malformed JSON at character {e.pos}: {e.msg}")
+                break  # incomplete value, wait for more input
+
+            # A number or literal ending exactly at the buffer edge may be truncated
+            if end == len(buffer) and not exhausted and not isinstance(value, (dict, list, str)):
+                break
+
+            pos = end
+            yield value
+
+        buffer = buffer[pos:]
+        if exhausted:
+            break
+        if len(buffer) > max_value_bytes:
+            raise JsonStreamError(f"JSON value exceeds {max_value_bytes} bytes")
+
+        try:
+            buffer += text_decoder.decode(await iterator.__anext__())
+        except StopAsyncIteration:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+
+    if in_array and not array_closed:
+        raise JsonStreamError("JSON array was not closed")
@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, BaseMessageChunk, convert_to_messages
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.config import settings
+
+
+def prompt_messages(prompt: Any) -> List[BaseMessage]:
+    """The messages a chat model would receive for ``prompt``."""
+    if isinstance(prompt, PromptValue):
+        return prompt.to_messages()
+    if isinstance(prompt, str):
+        return convert_to_messages([("human", prompt)])
+    return convert_to_messages(prompt)
+
+
+def prompt_fingerprint(model: str, temperature: float, prompt: Any) -> str:
+    """Stable SHA-256 of (model, temperature, rendered prompt messages)."""
+    payload = json.dumps(
+        [model, float(temperature), [[message.type, message.content] for message in prompt_messages(prompt)]],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LLM completions keyed on a prompt fingerprint, in an in-memory LRU of
+    ``max_entries`` backed by a SQLite table at ``path``.
+
+    Memory hits are answered without leaving the event loop; SQLite reads
+    and writes run in a thread. Entries older than ``ttl`` seconds are
+    treated as misses. Expired rows, and the oldest rows beyond
+    ``max_rows``, are deleted when the database is opened and again every
+    ``PRUNE_EVERY`` stores (so the table can briefly hold that many rows
+    over the cap); the file does not grow without bound.
+    """
+
+    PRUNE_EVERY = 256
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1024,
+        ttl: float = 7 * 24 * 3600,
+        max_rows: int = 100_000,
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "pruned": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+            self._prune()
+        return self._db
+
+    def _prune(self) -> None:
+        """Delete expired rows and the oldest rows past ``max_rows``. Caller holds ``_db_lock``."""
+        db = self._db
+        deleted = 0
+        if self.ttl > 0:
+            deleted += db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+        if self.max_rows > 0:
+            deleted += db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            ).rowcount
+        self._stores_since_prune = 0
+        self.stats["pruned"] += deleted
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, content: str) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (created_at, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            db = self._connection()
+            row = db.execute("SELECT created_at, content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._expired(row[0]):
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            return row
+
+    def _store(self, key: str, created_at: float, content: str) -> None:
+        with self._db_lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO responses (key, content, created_at) VALUES (?, ?, ?)",
+                (key, content, created_at),
+            )
+            self._stores_since_prune += 1
+            if self._stores_since_prune >= self.PRUNE_EVERY:
+                self._prune()
+
+    def get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry[0]):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.stats["memory_hits"] += 1
+        return entry[1]
+
+    def get_disk(self, key: str) -> Optional[str]:
+        row = self._load(key)
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        self._remember(key, *row)
+        return row[1]
+
+    def put(self, key: str, content: str) -> None:
+        created_at = time.time()
+        self._remember(key, created_at, content)
+        self._store(key, created_at, content)
+        self.stats["stores"] += 1
+
+    async def aput(self, key: str, content: str) -> None:
+        created_at = time.time()
+        self._remember(key, created_at, content)
+        await asyncio.to_thread(self._store, key, created_at, content)
+        self.stats["stores"] += 1
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachedChatModel(Runnable[Any, BaseMessage]):
+    """
+    Drop-in for a chat model in ``prompt | llm`` chains: the rendered
+    prompt is fingerprinted with the model name and temperature, and a
+    cached completion is returned as an AIMessage instead of calling the
+    model. Only the message text is cached. ``astream`` replays a hit as a
+    single chunk and stores a streamed completion once it has finished.
+    """
+
+    def __init__(self, llm: BaseChatModel, model: str, temperature: float, cache: LLMResponseCache):
+        self.llm = llm
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache
+
+    def _hit(self, content: str, tier: str) -> AIMessage:
+        return AIMessage(content=content, response_metadata={"cache": tier})
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = prompt_fingerprint(self.model, self.temperature, input)
+        content = self.cache.get_memory(key)
+        if content is not None:
+            return self._hit(content, "memory")
+        content = self.cache.get_disk(key)
+        if content is not None:
+            return self._hit(content, "disk")
+        message = self.llm.invoke(input, config, **kwargs)
+        if isinstance(message.content, str):
+            self.cache.put(key, message.content)
+        return message
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = prompt_fingerprint(self.model, self.temperature, input)
+        content = self.cache.get_memory(key)
+        if content is not None:
+            return self._hit(content, "memory")
+        content = await asyncio.to_thread(self.cache.get_disk, key)
+        if content is not None:
+            return self._hit(content, "disk")
+        message = await self.llm.ainvoke(input, config, **kwargs)
+        if isinstance(message.content, str):
+            await self.cache.aput(key, message.content)
+        return message
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[BaseMessageChunk]:
+        key = prompt_fingerprint(self.model, self.temperature, input)
+        content = self.cache.get_memory(key)
+        tier = "memory"
+        if content is None:
+            content = await asyncio.to_thread(self.cache.get_disk, key)
+            tier = "disk"
+        if content is not None:
+            yield AIMessageChunk(content=content, response_metadata={"cache": tier})
+            return
+        parts = []
+        async for chunk in self.llm.astream(input, config, **kwargs):
+            if isinstance(chunk.content, str):
+                parts.append(chunk.content)
+            yield chunk
+        # Reached only if the consumer read the whole stream
+        await self.cache.aput(key, "".join(parts))
+
+
+_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = LLMResponseCache(
+            settings.llm_cache_path,
+            settings.llm_cache_size,
+            settings.llm_cache_ttl_seconds,
+            settings.llm_cache_max_rows,
+        )
+    return _cache
+
+
+def close_llm_cache() -> None:
+    if _cache is not None:
+        _cache.close()
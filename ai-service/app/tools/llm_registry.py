@@ -0,0 +1,236 @@
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, Union
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+from app.tools.llm_cache import (
+    CachedChatModel,
+    LLMResponseCache,
+    get_llm_cache,
+    prompt_fingerprint,
+    prompt_messages,
+)
+from app.tools.single_flight import SingleFlight, get_single_flight
+from app.tools.tokens import count_tokens, encoding_for_model
+
+LLMKey = Tuple[str, float, str]
+# Builds the chat model for (model, temperature, purpose)
+LLMFactory = Callable[[str, float, str], BaseChatModel]
+
+
+class CoalescedChatModel(Runnable[Any, BaseMessage]):
+    """
+    Chat model wrapper whose async calls go through a SingleFlight keyed
+    on the prompt fingerprint, so identical prompts issued at the same
+    time (a cohort analyzing the same job) share one completion. Streams
+    are passed through uncoalesced.
+
+    Every completion logs its tokens in and out once, from the call that
+    ran it: the provider's usage figures when the response carries them,
+    else tiktoken counts. Callers that shared another's in-flight
+    completion, and cache hits, log as zero-cost.
+    """
+
+    def __init__(
+        self,
+        llm: Union[BaseChatModel, CachedChatModel],
+        model: str,
+        temperature: float,
+        purpose: str,
+        flight: SingleFlight,
+    ):
+        self.llm = llm
+        self.model = model
+        self.temperature = temperature
+        self.purpose = purpose
+        self.flight = flight
+
+    def _log_usage(
+        self,
+        input: Any,
+        content: Any,
+        message: Optional[BaseMessage],
+        started: float,
+        shared: bool = False,
+    ) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        cache = (getattr(message, "response_metadata", None) or {}).get("cache")
+        if cache or shared:
+            source = f"cache: {cache}" if cache else "shared in-flight completion"
+            print(f"LLM [{self.purpose}] {self.model}: 0 tokens in, 0 tokens out, {elapsed_ms:.0f} ms ({source})")
+            return
+
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            tokens_in, tokens_out = usage["input_tokens"], usage["output_tokens"]
+        else:
+            encoding_name = encoding_for_model(self.model)
+            tokens_in = sum(count_tokens(str(m.content), encoding_name) for m in prompt_messages(input))
+            tokens_out = count_tokens(str(content), encoding_name)
+        print(f"LLM [{self.purpose}] {self.model}: {tokens_in} tokens in, {tokens_out} tokens out, {elapsed_ms:.0f} ms")
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        started = time.perf_counter()
+        message = self.llm.invoke(input, config, **kwargs)
+        self._log_usage(input, message.content, message, started)
+        return message
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        started = time.perf_counter()
+        key = prompt_fingerprint(self.model, self.temperature, input)
+        ran = False
+
+        async def call() -> BaseMessage:
+            # Runs only for the caller that started the flight, so its usage is logged once
+            nonlocal ran
+            ran = True
+            message = await self.llm.ainvoke(input, config, **kwargs)
+            self._log_usage(input, message.content, message, started)
+            return message
+
+        message = await self.flight.do(key, call)
+        if not ran:
+            self._log_usage(input, message.content, message, started, shared=True)
+        return message
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[BaseMessageChunk]:
+        started = time.perf_counter()
+        parts = []
+        last = None
+        async for chunk in self.llm.astream(input, config, **kwargs):
+            parts.append(str(chunk.content))
+            last = chunk
+            yield chunk
+        self._log_usage(input, "".join(parts), last, started)
+
+
+class LLMRegistry:
+    """
+    Chat models shared across requests, one per (model, temperature,
+    purpose), instead of a new ChatOpenAI per call.
+
+    Every OpenAI model is built on the same pooled ``httpx.AsyncClient``,
+    so keep-alive connections and TLS sessions survive between requests.
+    ``purpose`` (e.g. "resume_extraction") is attached as a tag for
+    tracing and lets a ``factory`` return a different model per call site;
+    tests pass a factory that builds local fake models.
+
+    With a ``response_cache``, ``get`` returns models wrapped in
+    CachedChatModel: temperature-0 calls are cached unless the call site
+    passes ``cache=False``, other temperatures only with ``cache=True``.
+    Every model is then wrapped in CoalescedChatModel, so concurrent
+    identical prompts cost one cache lookup and at most one completion.
+    """
+
+    def __init__(
+        self,
+        api_key: str = "",
+        max_connections: int = 20,
+        max_keepalive_connections: int = 20,
+        timeout: float = 60.0,
+        factory: Optional[LLMFactory] = None,
+        response_cache: Optional[LLMResponseCache] = None,
+    ):
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout = timeout
+        self.factory = factory or self._openai
+        self.response_cache = response_cache
+        self._models: Dict[LLMKey, BaseChatModel] = {}
+        self._wrapped: Dict[Tuple[LLMKey, bool], CoalescedChatModel] = {}
+        self.flight = get_single_flight("llm")
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                timeout=self.timeout,
+            )
+        return self._client
+
+    def _openai(self, model: str, temperature: float, purpose: str) -> BaseChatModel:
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            api_key=self.api_key,
+            http_async_client=self.client,
+            tags=[purpose],
+        )
+
+    def get(
+        self,
+        model: str,
+        temperature: float,
+        purpose: str,
+        cache: Optional[bool] = None,
+    ) -> CoalescedChatModel:
+        key = (model, float(temperature), purpose)
+        if key not in self._models:
+            self._models[key] = self.factory(*key)
+
+        if cache is None:
+            cache = temperature == 0
+        cache = cache and self.response_cache is not None
+        if (key, cache) not in self._wrapped:
+            llm = self._models[key]
+            if cache:
+                llm = CachedChatModel(llm, model, temperature, self.response_cache)
+            self._wrapped[(key, cache)] = CoalescedChatModel(llm, model, temperature, purpose, self.flight)
+        return self._wrapped[(key, cache)]
+
+    async def close(self) -> None:
+        self._models.clear()
+        self._wrapped.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_registry: Optional[LLMRegistry] = None
+
+
+def get_llm_registry() -> LLMRegistry:
+    """The process-wide registry; its HTTP client is closed by the app lifespan."""
+    global _registry
+    if _registry is None:
+        _registry = LLMRegistry(
+            settings.openai_api_key,
+            settings.llm_max_connections,
+            settings.llm_max_keepalive_connections,
+            settings.llm_timeout_seconds,
+            response_cache=get_llm_cache() if settings.llm_cache_enabled else None,
+        )
+    return _registry
+
+
+def set_llm_registry(registry: Optional[LLMRegistry]) -> None:
+    """Install a registry (e.g. one with a fake-model factory); None resets to the default."""
+    global _registry
+    _registry = registry
+
+
+def get_llm(
+    model: str,
+    temperature: float,
+    purpose: str,
+    cache: Optional[bool] = None,
+) -> CoalescedChatModel:
+    return get_llm_registry().get(model, temperature, purpose, cache)
+
+
+async def close_llm_registry() -> None:
+    if _registry is not None:
+        await _registry.close()
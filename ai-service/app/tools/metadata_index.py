@@ -0,0 +1,124 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_RANGE_OPS = {"$gt", "$gte", "$lt", "$lte"}
+_SUPPORTED_OPS = _RANGE_OPS | {"$eq", "$in"}
+
+
+class InvalidFilter(ValueError):
+    """Raised for a malformed ``where`` filter."""
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _hash_key(value: Any) -> Any:
+    # 1 and 1.0 are the same key; True stays distinct from 1
+    if isinstance(value, bool):
+        return ("bool", value)
+    if _is_number(value):
+        return ("num", float(value))
+    return ("str", value)
+
+
+class MetadataIndex:
+    """
+    Secondary indexes over document metadata.
+
+    Every scalar field value goes into a hash index (value -> rows) for
+    equality and ``$in``; numeric values are also kept in a per-field array
+    that is sorted lazily for range filters. List-valued fields index each
+    element, so ``{"skills": "React"}`` matches ``skills: ["React", "Node"]``.
+    """
+
+    def __init__(self):
+        self._hash: Dict[str, Dict[Any, List[int]]] = defaultdict(lambda: defaultdict(list))
+        self._numeric: Dict[str, Tuple[List[float], List[int]]] = defaultdict(lambda: ([], []))
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def add(self, row: int, metadata: dict) -> None:
+        for field, value in metadata.items():
+            values = value if isinstance(value, list) else [value]
+            for item in values:
+                if isinstance(item, (dict, list)) or item is None:
+                    continue
+                self._hash[field][_hash_key(item)].append(row)
+                if _is_number(item):
+                    numbers, rows = self._numeric[field]
+                    numbers.append(float(item))
+                    rows.append(row)
+                    self._sorted.pop(field, None)
+
+    def _sorted_numeric(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        if field not in self._sorted:
+            numbers, rows = self._numeric.get(field, ([], []))
+            values = np.asarray(numbers, dtype=np.float64)
+            order = np.argsort(values, kind="stable")
+            self._sorted[field] = (values[order], np.asarray(rows, dtype=np.int64)[order])
+        return self._sorted[field]
+
+    def _equal(self, field: str, value: Any) -> np.ndarray:
+        if isinstance(value, (dict, list)) or value is None:
+            raise InvalidFilter(f"Unsupported value for '{field}': {value!r}")
+        return np.asarray(self._hash.get(field, {}).get(_hash_key(value), ()), dtype=np.int64)
+
+    def _range(self, field: str, ops: Dict[str, Any]) -> np.ndarray:
+        values, rows = self._sorted_numeric(field)
+        lo, hi = 0, len(values)
+        for op, bound in ops.items():
+            if not _is_number(bound):
+                raise InvalidFilter(f"'{op}' on '{field}' needs a number")
+            if op == "$gt":
+                lo = max(lo, int(np.searchsorted(values, bound, side="right")))
+            elif op == "$gte":
+                lo = max(lo, int(np.searchsorted(values, bound, side="left")))
+            elif op == "$lt":
+                hi = min(hi, int(np.searchsorted(values, bound, side="left")))
+            elif op == "$lte":
+                hi = min(hi, int(np.searchsorted(values, bound, side="right")))
+        return rows[lo:hi] if lo < hi else np.empty(0, dtype=np.int64)
+
+    def _match_field(self, field: str, condition: Any) -> np.ndarray:
+        if not isinstance(condition, dict):
+            return np.unique(self._equal(field, condition))
+
+        unknown = set(condition) - _SUPPORTED_OPS
+        if not condition:
+            raise InvalidFilter(f"Empty condition for '{field}'")
+        if unknown:
+            raise InvalidFilter(f"Unsupported operator(s) for '{field}': {', '.join(sorted(unknown))}")
+
+        matches: List[np.ndarray] = []
+        if "$eq" in condition:
+            matches.append(np.unique(self._equal(field, condition["$eq"])))
+        if "$in" in condition:
+            options = condition["$in"]
+            if not isinstance(options, list):
+                raise InvalidFilter(f"'$in' on '{field}' needs a list")
+            parts = [self._equal(field, option) for option in options]
+            matches.append(np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64))
+        ranges = {op: condition[op] for op in condition if op in _RANGE_OPS}
+        if ranges:
+            matches.append(np.unique(self._range(field, ranges)))
+
+        result = matches[0]
+        for other in matches[1:]:
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def match(self, where: dict) -> np.ndarray:
+        """Sorted rows satisfying every field condition in ``where``."""
+        if not isinstance(where, dict) or not where:
+            raise InvalidFilter("'where' must be a non-empty object")
+
+        result: Optional[np.ndarray] = None
+        # Evaluate equality conditions first; they are usually the most selective
+        for field, condition in sorted(where.items(), key=lambda item: isinstance(item[1], dict)):
+            rows = self._match_field(field, condition)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
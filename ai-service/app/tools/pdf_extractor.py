@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Iterator, Optional
+
+from app.config import settings
+
+
+class PdfExtractionError(ValueError):
+    """Raised when a PDF is rejected by a guard or cannot be parsed in time."""
+
+
+def _warm_worker() -> None:
+    # Import the parser once per worker so the first real job does not pay for it
+    import PyPDF2  # noqa: F401
+
+
+def iter_page_text(pdf_bytes: bytes, max_pages: int) -> Iterator[str]:
+    """Text of each of the first ``max_pages`` pages, parsed only when requested."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(BytesIO(pdf_bytes))
+    for page_number in range(min(len(reader.pages), max_pages)):
+        yield reader.pages[page_number].extract_text() + "\n"
+
+
+def _extract_pages(pdf_bytes: bytes, max_pages: int, max_chars: Optional[int] = None) -> str:
+    """
+    Runs in a worker process. Stops parsing once ``max_chars`` characters
+    have been collected, so pages past the caller's budget are never read.
+    """
+    pages = []
+    collected = 0
+    for text in iter_page_text(pdf_bytes, max_pages):
+        pages.append(text)
+        collected += len(text)
+        if max_chars is not None and collected >= max_chars:
+            break
+    return "".join(pages)
+
+
+class PdfExtractor:
+    """
+    Process pool shared by every PDF call site (content sources and resume
+    parsing), so parsing runs on all cores instead of the event loop.
+
+    Workers are spawned (not forked from the threaded server) and warmed
+    up front. Oversized uploads are rejected before they reach a worker,
+    only the first ``max_pages`` pages are read, and each job has a
+    timeout. At most ``workers`` jobs are submitted at once, so a job never
+    waits in the pool's queue and its timeout covers only the parse.
+
+    A timed-out job's pool is terminated, since its worker cannot be
+    stopped on its own, and rebuilt on the next call; jobs that were
+    running on it are retried once. A crashed worker also causes the pool
+    to be rebuilt.
+    """
+
+    def __init__(
+        self,
+        workers: int = 0,
+        timeout: float = 30.0,
+        max_pages: int = 200,
+        max_bytes: int = 20 * 1024 * 1024,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.workers)
+        # Pools terminated over another job's timeout
+        self._recycled: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+        self._warming: Optional[asyncio.Future] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+        return self._pool
+
+    async def start(self) -> None:
+        """Spawn every worker now rather than on the first uploads."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self.pool, _warm_worker) for _ in range(self.workers)
+        ])
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        """Stop using a broken ``pool``; the next call starts a fresh one."""
+        if self._pool is pool:
+            self.shutdown()
+
+    def _recycle(self, pool: ProcessPoolExecutor) -> None:
+        """Kill every worker of ``pool``, including one stuck on a timed-out job."""
+        self._recycled.add(pool)
+        if self._pool is pool:
+            self._pool = None
+        if hasattr(pool, "terminate_workers"):  # Python 3.14+
+            pool.terminate_workers()
+        else:
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._warming = asyncio.ensure_future(self._rewarm())
+
+    async def _rewarm(self) -> None:
+        try:
+            await self.start()
+        except Exception as e:
+            print(f"⚠️ PDF worker pool failed to restart: {e}")
+        finally:
+            self._warming = None
+
+    async def extract(self, pdf_bytes: bytes, max_chars: Optional[int] = None) -> str:
+        """
+        Text of a PDF, one line break between pages. With ``max_chars``
+        extraction stops at the first page that reaches the budget.
+        """
+        if len(pdf_bytes) > self.max_bytes:
+            raise PdfExtractionError(
+                f"PDF is {len(pdf_bytes) / 2**20:.1f} MB, limit is {self.max_bytes / 2**20:.1f} MB"
+            )
+
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            for attempt in range(2):
+                if self._warming is not None:
+                    # Spawn the replacement pool before this job's timeout starts
+                    await asyncio.shield(self._warming)
+                pool = self.pool
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(pool, _extract_pages, pdf_bytes, self.max_pages, max_chars),
+                        self.timeout,
+                    )
+                except asyncio.TimeoutError:
+                    self._recycle(pool)
+                    raise PdfExtractionError(f"PDF extraction timed out after {self.timeout:g}s")
+                except BrokenProcessPool:
+                    if pool in self._recycled and attempt == 0:
+                        continue
+                    self._discard(pool)
+                    raise PdfExtractionError("PDF worker crashed while parsing this file")
+
+
+_extractor: Optional[PdfExtractor] = None
+
+
+def get_pdf_extractor() -> PdfExtractor:
+    """The process-wide extractor; the app lifespan warms and shuts it down."""
+    global _extractor
+    if _extractor is None:
+        _extractor = PdfExtractor(
+            settings.pdf_workers,
+            settings.pdf_timeout_seconds,
+            settings.pdf_max_pages,
+            settings.pdf_max_bytes,
+        )
+    return _extractor
+
+
+async def extract_pdf(pdf_bytes: bytes, max_chars: Optional[int] = None) -> str:
+    return await get_pdf_extractor().extract(pdf_bytes, max_chars)
+
+
+def shutdown_pdf_extractor() -> None:
+    if _extractor is not None:
+        _extractor.shutdown()
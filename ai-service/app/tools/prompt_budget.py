@@ -0,0 +1,136 @@
+import asyncio
+from typing import Dict, Optional, Sequence
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.config import settings
+from app.tools.chunker import chunk_text
+from app.tools.llm_registry import get_llm
+from app.tools.tokens import count_tokens, encoding_for_model, truncate_to_tokens
+
+# Summarize-the-summaries rounds before falling back to truncation
+MAX_REDUCE_ROUNDS = 2
+# Smallest summary worth asking the model for
+MIN_SUMMARY_TOKENS = 64
+
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_template("""
+Condense the following text to at most {max_words} words.
+{focus}
+Keep the original wording for names and technical terms. Output only the condensed text.
+
+Text:
+{text}
+""")
+
+
+async def summarize_to_budget(
+    text: str,
+    max_tokens: int,
+    focus: str = "",
+    model: Optional[str] = None,
+) -> str:
+    """
+    Map-reduce ``text`` down to ``max_tokens`` tokens (of the summary model).
+
+    The text is split into ``summary_chunk_tokens`` chunks that are
+    summarized in parallel (at most ``summary_concurrency`` at once), each
+    to its share of the budget; if the joined summaries are still too long
+    they go through another round. Anything left over budget, or a failed
+    summarization call, falls back to keeping the leading tokens.
+    """
+    model = model or settings.summary_model
+    encoding_name = encoding_for_model(model)
+    semaphore = asyncio.Semaphore(settings.summary_concurrency)
+
+    async def summarize(chunk: str, target_tokens: int) -> str:
+        chain = SUMMARY_PROMPT | get_llm(model, 0, "summarization")
+        async with semaphore:
+            result = await chain.ainvoke({
+                "text": chunk,
+                "focus": focus,
+                "max_words": max(1, target_tokens * 3 // 4),
+            })
+        return result.content.strip()
+
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if count_tokens(text, encoding_name) <= max_tokens:
+            return text
+        chunks = chunk_text(text, settings.summary_chunk_tokens, 0, encoding_name)
+        target_tokens = max(MIN_SUMMARY_TOKENS, max_tokens // len(chunks))
+        try:
+            summaries = await asyncio.gather(*[summarize(chunk.text, target_tokens) for chunk in chunks])
+        except Exception as e:
+            print(f"⚠️ Summarization failed ({e}); truncating to {max_tokens} tokens")
+            break
+        text = "\n\n".join(summaries)
+    return truncate_to_tokens(text, max_tokens, encoding_name)
+
+
+class PromptBudget:
+    """
+    Fits a prompt's variables into ``max_tokens`` tokens for ``model``.
+
+    ``fit`` measures the template and every variable. Variables named in
+    ``compress`` share what the template and the other variables leave:
+    ones under an even share keep their text, the remainder is split among
+    the rest, and each over-budget variable is map-reduce summarized (see
+    summarize_to_budget) with ``focus`` telling the summarizer what to keep.
+    """
+
+    def __init__(self, model: str, max_tokens: int, purpose: str, focus: str = ""):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.purpose = purpose
+        self.focus = focus
+        self.encoding_name = encoding_for_model(model)
+
+    def measure(self, prompt: ChatPromptTemplate, inputs: Dict[str, str]) -> Dict[str, int]:
+        """Tokens of each variable, plus ``"_template"`` for the fixed text."""
+        counts = {name: count_tokens(str(value), self.encoding_name) for name, value in inputs.items()}
+        empty = {name: "" for name in prompt.input_variables}
+        counts["_template"] = count_tokens(prompt.format(**empty), self.encoding_name)
+        return counts
+
+    async def fit(
+        self,
+        prompt: ChatPromptTemplate,
+        inputs: Dict[str, str],
+        compress: Sequence[str],
+    ) -> Dict[str, str]:
+        counts = self.measure(prompt, inputs)
+        total = sum(counts.values())
+        fixed = total - sum(counts[name] for name in compress)
+        available = max(0, self.max_tokens - fixed)
+
+        shares: Dict[str, int] = {}
+        pending = sorted(compress, key=lambda name: counts[name])
+        while pending:
+            share = available // len(pending)
+            name = pending[0]
+            if counts[name] > share:
+                break
+            shares[name] = counts[name]
+            available -= counts[name]
+            pending.pop(0)
+        for name in pending:
+            shares[name] = available // len(pending)
+
+        fitted = dict(inputs)
+        over_budget = [name for name in compress if counts[name] > shares[name]]
+        summaries = await asyncio.gather(*[
+            summarize_to_budget(str(inputs[name]), shares[name], self.focus) for name in over_budget
+        ])
+        for name, summary in zip(over_budget, summaries):
+            # The summary model may tokenize differently; enforce the share in ours
+            fitted[name] = truncate_to_tokens(summary, shares[name], self.encoding_name)
+
+        fitted_total = total - sum(counts[name] for name in over_budget) + sum(
+            count_tokens(fitted[name], self.encoding_name) for name in over_budget
+        )
+        detail = ", ".join(f"{name}={counts[name]}" for name in inputs)
+        print(
+            f"Prompt budget [{self.purpose}]: {total} -> {fitted_total} tokens "
+            f"(limit {self.max_tokens}; {detail}; compressed {over_budget or 'nothing'})"
+        )
+        return fitted
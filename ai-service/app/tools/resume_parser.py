@@ -1,48 +1,69 @@
+import asyncio
 import base64
+import binascii
 import json
-from io import BytesIO
-from typing import List
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
 
-from PyPDF2 import PdfReader
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.models import ResumeData
 from app.config import settings
+from app.tools.llm_registry import get_llm
+from app.tools.extraction_cache import content_digest, extract_pdf_by_digest, get_extraction_cache
+from app.tools.pdf_extractor import get_pdf_extractor
+from app.tools.prompt_budget import PromptBudget
+from app.tools.skill_matcher import extract_skills, get_skill_matcher
+from app.tools.uploads import PdfUpload
+
+# Characters of resume text extracted from the PDF; extraction stops once it has them
+RESUME_TEXT_CHARS = 16000
+# Token budget of the structured-extraction prompt; longer resumes are condensed
+RESUME_PROMPT_TOKENS = 3000
+RESUME_SUMMARY_FOCUS = "Keep every skill, technology, job title, employer, date, degree and institution."
 
 
 async def parse_resume(resume_base64: str) -> ResumeData:
-    """
-    Parse resume PDF and extract structured data using REAL LLM.
-    
-    1. Extracts text from PDF using PyPDF2
-    2. Sends text to GPT-4 for structured extraction
-    3. Returns actual skills/experience/education from the resume
-    """
+    """Parse a base64-encoded resume PDF (see parse_resume_pdf)."""
     try:
-        # Step 1: Actually extract text from PDF
         pdf_bytes = base64.b64decode(resume_base64)
-        reader = PdfReader(BytesIO(pdf_bytes))
-        
-        resume_text = ""
-        for page in reader.pages:
-            resume_text += page.extract_text() + "\n"
-        
-        if len(resume_text.strip()) < 50:
-            return ResumeData(
-                skills=["Parse Error: PDF appears empty"],
-                experience=["Unable to extract text"],
-                education=["Check PDF format"]
-            )
-        
-        # Step 2: Use LLM to extract structured data
-        llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0,
-            api_key=settings.openai_api_key
-        )
-        
-        extraction_prompt = ChatPromptTemplate.from_template("""
+    except (binascii.Error, ValueError) as e:
+        print(f"Resume parsing error: {e}")
+        return local_fallback_resume("")
+
+    async def load_bytes() -> bytes:
+        return pdf_bytes
+
+    return await parse_resume_pdf(content_digest(pdf_bytes), load_bytes)
+
+
+async def parse_resume_upload(upload: PdfUpload) -> ResumeData:
+    """Parse a resume uploaded as a multipart file (see parse_resume_pdf)."""
+    return await parse_resume_pdf(upload.digest, upload.read)
+
+
+def merge_local_skills(llm_skills: List[str], resume_text: str) -> List[str]:
+    """
+    Append taxonomy skills found in the text that the LLM left out. LLM
+    skills are canonicalized through the matcher first, so "ReactJS" from
+    the LLM and "React" in the text count as the same skill.
+    """
+    matcher = get_skill_matcher()
+    known = set()
+    for skill in llm_skills:
+        known.add(skill.lower())
+        known.update(canonical.lower() for canonical, _ in matcher.match(skill))
+    local = [skill for skill in extract_skills(resume_text) if skill.lower() not in known]
+    return llm_skills + local
+
+
+class EmptyResumeError(ValueError):
+    """Raised when a resume PDF yields too little text to parse."""
+
+
+EXTRACTION_PROMPT = ChatPromptTemplate.from_template("""
 Extract structured information from this resume. Return ONLY valid JSON.
 
 Resume:
@@ -57,27 +78,107 @@ JSON format:
 
 Output:
 """)
-        
-        chain = extraction_prompt | llm
-        result = await chain.ainvoke({"resume_text": resume_text[:4000]})
-        
-        # Step 3: Parse JSON response
-        response_text = result.content.strip()
-        
-        # Clean up markdown code blocks if present
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        parsed_data = json.loads(response_text)
-        
+
+
+async def get_cached_resume(digest: str) -> Optional[ResumeData]:
+    cached = await get_extraction_cache().get(digest)
+    if cached.get("resume"):
+        return ResumeData(**cached["resume"])
+    return None
+
+
+async def extract_resume_text(digest: str, load_bytes: Callable[[], Awaitable[bytes]]) -> str:
+    """Resume text from the PDF (in the shared process pool), cached by digest."""
+    resume_text = await extract_pdf_by_digest(digest, load_bytes, RESUME_TEXT_CHARS)
+    if len(resume_text.strip()) < 50:
+        raise EmptyResumeError("PDF appears empty")
+    return resume_text
+
+
+async def structure_resume_text(digest: str, resume_text: str) -> ResumeData:
+    """
+    Send the resume text to GPT-4o for structured extraction and cache the
+    result under ``digest``. Raises json.JSONDecodeError on a malformed
+    response and whatever the LLM call raises.
+    """
+    llm = get_llm("gpt-4o", 0, "resume_extraction")
+    chain = EXTRACTION_PROMPT | llm
+    budget = PromptBudget("gpt-4o", RESUME_PROMPT_TOKENS, "resume_extraction", RESUME_SUMMARY_FOCUS)
+    inputs = await budget.fit(EXTRACTION_PROMPT, {"resume_text": resume_text}, compress=["resume_text"])
+    result = await chain.ainvoke(inputs)
+
+    response_text = result.content.strip()
+
+    # Clean up markdown code blocks if present
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0].strip()
+
+    parsed_data = json.loads(response_text)
+
+    resume_data = ResumeData(
+        skills=merge_local_skills(parsed_data.get("skills", ["Skills not found"]), resume_text),
+        experience=parsed_data.get("experience", ["Experience not found"]),
+        education=parsed_data.get("education", ["Education not found"])
+    )
+    # Only successful LLM extractions are cached; fallbacks are retried
+    await get_extraction_cache().update(digest, resume=resume_data.model_dump())
+    return resume_data
+
+
+async def extract_resume_data(
+    digest: str,
+    load_bytes: Callable[[], Awaitable[bytes]],
+    extract_slots: Optional[asyncio.Semaphore] = None,
+    llm_slots: Optional[asyncio.Semaphore] = None,
+) -> ResumeData:
+    """
+    Text extraction then structured extraction, raising on any failure
+    (EmptyResumeError, PdfExtractionError, json.JSONDecodeError, LLM
+    errors) instead of falling back, so batch callers can report it.
+
+    ``extract_slots`` / ``llm_slots`` bound how many resumes are in each
+    stage at once (see iter_parsed_resumes).
+    """
+    cached = await get_cached_resume(digest)
+    if cached is not None:
+        return cached
+    async with extract_slots or nullcontext():
+        resume_text = await extract_resume_text(digest, load_bytes)
+    async with llm_slots or nullcontext():
+        return await structure_resume_text(digest, resume_text)
+
+
+async def parse_resume_pdf(digest: str, load_bytes: Callable[[], Awaitable[bytes]]) -> ResumeData:
+    """
+    Parse resume PDF and extract structured data using REAL LLM.
+    
+    1. Extracts text from PDF using PyPDF2
+    2. Sends text to GPT-4 for structured extraction
+    3. Returns actual skills/experience/education from the resume
+
+    Both the text and the LLM's structured result are cached by the
+    SHA-256 of the PDF (``digest``), so re-uploading the same resume skips
+    both steps and ``load_bytes`` is never called.
+
+    Failures come back as placeholder or locally matched data rather than
+    errors; batch parsing uses extract_resume_data, which raises.
+    """
+    resume_text = ""
+    try:
+        cached = await get_cached_resume(digest)
+        if cached is not None:
+            return cached
+        resume_text = await extract_resume_text(digest, load_bytes)
+        return await structure_resume_text(digest, resume_text)
+
+    except EmptyResumeError:
         return ResumeData(
-            skills=parsed_data.get("skills", ["Skills not found"]),
-            experience=parsed_data.get("experience", ["Experience not found"]),
-            education=parsed_data.get("education", ["Education not found"])
+            skills=["Parse Error: PDF appears empty"],
+            experience=["Unable to extract text"],
+            education=["Check PDF format"]
         )
-        
     except json.JSONDecodeError as e:
         print(f"JSON parse error: {e}")
         return ResumeData(
@@ -87,32 +188,70 @@ Output:
         )
     except Exception as e:
         print(f"Resume parsing error: {e}")
-        print("Falling back to local regex extraction...")
-        
-        # IMPROVED FALLBACK: Extract skills via regex from the text we already extracted
-        # This ensures the "demo" still works even if OpenAI is out of credits
-        skills_found = []
-        common_skills = [
-            "Python", "Java", "JavaScript", "React", "Node.js", "AWS", "Docker", 
-            "Kubernetes", "SQL", "NoSQL", "TypeScript", "C++", "C#", "Go", "Rust", 
-            "Swift", "Kotlin", "Flutter", "Android", "iOS", "Machine Learning", 
-            "TensorFlow", "PyTorch", "Pandas", "NumPy", "Scikit-learn", "Git", "Linux"
-        ]
+        print("Falling back to local skill matcher...")
         
-        # Check for skills in the extracted text
-        if 'resume_text' in locals() and resume_text:
-            lower_text = resume_text.lower()
-            for skill in common_skills:
-                # Simple check: is the skill name in the text?
-                # (A real regex would be better but this works for demo)
-                if skill.lower() in lower_text:
-                    skills_found.append(skill)
+        return local_fallback_resume(resume_text)
+
+
+def local_fallback_resume(resume_text: str) -> ResumeData:
+    """Resume data from the local skill matcher alone, for when parsing fails."""
+    # Fallback: extract skills locally from the text we already extracted
+    # This ensures the "demo" still works even if OpenAI is out of credits
+    skills_found = []
+    if resume_text:
+        skills_found = extract_skills(resume_text)
+    
+    if not skills_found:
+        skills_found = ["General Programming (Fallback)"]
         
-        if not skills_found:
-            skills_found = ["General Programming (Fallback)"]
-            
-        return ResumeData(
-            skills=skills_found,
-            experience=["Experience extracted locally (LLM unavailable)"],
-            education=["Education extracted locally (LLM unavailable)"]
-        )
+    return ResumeData(
+        skills=skills_found,
+        experience=["Experience extracted locally (LLM unavailable)"],
+        education=["Education extracted locally (LLM unavailable)"]
+    )
+
+
+@dataclass
+class ResumeBatchResult:
+    """Outcome of one resume in a batch, in completion order."""
+
+    index: int
+    filename: str
+    resume_data: Optional[ResumeData] = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+
+async def iter_parsed_resumes(
+    uploads: List[PdfUpload],
+    llm_concurrency: Optional[int] = None,
+) -> AsyncIterator[ResumeBatchResult]:
+    """
+    Parse many resumes as a pipeline, yielding each as soon as it is done.
+
+    Every resume starts at once but passes through two bounded stages:
+    extraction keeps the PDF process pool fed (two jobs per worker, so
+    only that many files are in memory) and at most ``llm_concurrency``
+    structured-extraction calls are in flight. While one resume waits on
+    the LLM the next ones are already being extracted.
+    """
+    extract_slots = asyncio.Semaphore(get_pdf_extractor().workers * 2)
+    llm_slots = asyncio.Semaphore(llm_concurrency or settings.resume_batch_llm_concurrency)
+
+    async def run(index: int, upload: PdfUpload) -> ResumeBatchResult:
+        result = ResumeBatchResult(index=index, filename=upload.filename)
+        started = time.perf_counter()
+        try:
+            result.resume_data = await extract_resume_data(upload.digest, upload.read, extract_slots, llm_slots)
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+        result.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    tasks = [asyncio.create_task(run(i, upload)) for i, upload in enumerate(uploads)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls: while a call for ``key`` is in
+    flight, later callers await the same task instead of starting their
+    own, and all of them get its result (or its exception).
+
+    The shared work runs as its own task, so one caller being cancelled
+    does not cancel it for the others. Nothing is kept once the call
+    finishes; caching results is left to the layers underneath.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.stats = {"calls": 0, "executed": 0, "collapsed": 0, "in_flight": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        self.stats["calls"] += 1
+        task = self._calls.get(key)
+        if task is not None:
+            self.stats["collapsed"] += 1
+        else:
+            self.stats["executed"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.stats["in_flight"] = len(self._calls)
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        self.stats["in_flight"] = len(self._calls)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """The process-wide group for one kind of call (e.g. "llm", "search")."""
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+
+def single_flight_stats() -> Dict[str, dict]:
+    return {name: dict(group.stats) for name, group in _groups.items()}
@@ -0,0 +1,157 @@
+import json
+import re
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+# Bundled taxonomy, used unless settings.skill_taxonomy_path points elsewhere.
+# It is a seed set (~1,400 skills, ~2,200 patterns with aliases) covering
+# common tech, data, design and professional skills, not an exhaustive
+# catalogue. To extend it, add ``"Canonical": ["alias", ...]`` entries to
+# "skills" (aliases are matched case-insensitively, an alias already used
+# by another skill is ignored) and list ambiguous short or everyday terms
+# under "case_sensitive"; or point SKILL_TAXONOMY_PATH at a larger file in
+# the same format, e.g. one generated from ESCO or O*NET.
+DEFAULT_TAXONOMY_PATH = Path(__file__).resolve().parent.parent / "data" / "skill_taxonomy.json"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class SkillMatcher:
+    """
+    Aho-Corasick automaton over every alias of a skill taxonomy.
+
+    ``match`` lowercases the text, walks it once and keeps only hits that
+    sit on token boundaries: an alias starting or ending in a letter or
+    digit must not touch another one, so "Go" does not fire inside "good"
+    while "C++" and "C#" still match before punctuation. Terms listed as
+    case-sensitive (short or everyday words such as "Go", "R", "Spark")
+    must also appear with that exact casing. Overlapping hits resolve to
+    the longest alias, so "Spring Boot" is not also counted as "Spring".
+    """
+
+    def __init__(self, skills: Dict[str, Iterable[str]], case_sensitive: Iterable[str] = ()):
+        exact_forms = {term.lower(): term for term in case_sensitive}
+        # Per pattern: canonical skill, exact casing (or None), length
+        self._patterns: List[Tuple[str, Optional[str], int]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        seen = set()
+        for canonical, aliases in skills.items():
+            for term in [canonical, *aliases]:
+                key = _WHITESPACE_RE.sub(" ", term.strip().lower())
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                self._add(key, (canonical, exact_forms.get(key), len(key)))
+        self._build_failure_links()
+
+    @classmethod
+    def from_file(cls, path: Path) -> "SkillMatcher":
+        """Load ``{"skills": {canonical: [aliases]}, "case_sensitive": [terms]}``."""
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(data["skills"], data.get("case_sensitive", ()))
+
+    @property
+    def pattern_count(self) -> int:
+        return len(self._patterns)
+
+    def _add(self, key: str, pattern: Tuple[str, Optional[str], int]) -> None:
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        self._out[node].append(len(self._patterns))
+        self._patterns.append(pattern)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Suffix outputs are merged so matching never walks fail links
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _on_boundary(self, text: str, start: int, end: int) -> bool:
+        if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+            return False
+        return True
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """Non-overlapping ``(start, end, canonical)`` hits in whitespace-normalized ``text``."""
+        text = _WHITESPACE_RE.sub(" ", text)
+        folded = text.lower()
+        if len(folded) != len(text):
+            # A few characters lowercase to two; fold one by one to keep offsets aligned
+            folded = "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        hits = []
+        node = 0
+        for end, char in enumerate(folded, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern_id in out[node]:
+                canonical, exact, length = patterns[pattern_id]
+                start = end - length
+                if exact is not None and text[start:end] != exact:
+                    continue
+                if self._on_boundary(text, start, end):
+                    hits.append((start, end, canonical))
+
+        # Longest match wins where hits overlap
+        hits.sort(key=lambda hit: (hit[0], hit[0] - hit[1]))
+        selected = []
+        covered_until = 0
+        for start, end, canonical in hits:
+            if start >= covered_until:
+                selected.append((start, end, canonical))
+                covered_until = end
+        return selected
+
+    def match(self, text: str) -> List[Tuple[str, int]]:
+        """Canonical skills found in ``text`` with hit counts, most frequent first."""
+        counts: Dict[str, int] = {}
+        for _, _, canonical in self.find(text):
+            counts[canonical] = counts.get(canonical, 0) + 1
+        # Ties keep first-appearance order (dicts preserve insertion order)
+        return sorted(counts.items(), key=lambda item: -item[1])
+
+
+_matcher: Optional[SkillMatcher] = None
+
+
+def get_skill_matcher() -> SkillMatcher:
+    """The process-wide matcher, compiled from the taxonomy on first use."""
+    global _matcher
+    if _matcher is None:
+        _matcher = SkillMatcher.from_file(settings.skill_taxonomy_path or DEFAULT_TAXONOMY_PATH)
+    return _matcher
+
+
+def extract_skills(text: str) -> List[str]:
+    """Canonical skills mentioned in ``text``, most frequent first."""
+    return [skill for skill, _ in get_skill_matcher().match(text)]
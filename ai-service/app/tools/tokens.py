@@ -0,0 +1,57 @@
+import re
+from functools import lru_cache
+from typing import List
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Rough stand-in when tiktoken or its encoding files are unavailable offline
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = DEFAULT_ENCODING):
+    """Return a tiktoken encoding, or None if it cannot be loaded."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        print(f"tiktoken unavailable ({e}); using approximate token counts")
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return len(_APPROX_TOKEN_RE.findall(text))
+    return len(encoding.encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str], encoding_name: str = DEFAULT_ENCODING) -> List[int]:
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return [len(_APPROX_TOKEN_RE.findall(text)) for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+@lru_cache(maxsize=None)
+def encoding_for_model(model: str) -> str:
+    """Name of the encoding an OpenAI model uses, DEFAULT_ENCODING if unknown."""
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_name_for_model(model)
+    except Exception:
+        return DEFAULT_ENCODING
+
+
+def truncate_to_tokens(text: str, max_tokens: int, encoding_name: str = DEFAULT_ENCODING) -> str:
+    """The leading ``max_tokens`` tokens of ``text``."""
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        for i, match in enumerate(_APPROX_TOKEN_RE.finditer(text)):
+            if i == max_tokens:
+                return text[:match.start()]
+        return text
+    tokens = encoding.encode_ordinary(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
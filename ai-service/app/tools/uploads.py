@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+
+from app.tools.pdf_extractor import get_pdf_extractor
+
+# Bytes hashed per read while scanning a spooled upload
+_HASH_CHUNK = 1024 * 1024
+
+
+class PdfUpload:
+    """
+    A PDF received as a multipart file part.
+
+    The multipart parser has already streamed it into a spooled temp file
+    (in memory when small, on disk otherwise); it is hashed in chunks so a
+    cached result can be served without ever loading the whole file, and
+    read into memory once only when it actually has to be parsed.
+    """
+
+    type = "pdf"
+
+    def __init__(self, file: BinaryIO, digest: str, size: int, filename: str = ""):
+        self.file = file
+        self.digest = digest
+        self.size = size
+        self.filename = filename
+
+    def _read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    async def read(self) -> bytes:
+        return await asyncio.to_thread(self._read)
+
+
+def _hash_file(file: BinaryIO, max_bytes: int):
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := file.read(_HASH_CHUNK):
+        size += len(chunk)
+        if size > max_bytes:
+            return None, size
+        digest.update(chunk)
+    return digest.hexdigest(), size
+
+
+async def spool_pdf_upload(upload: UploadFile) -> PdfUpload:
+    """Validate and hash an uploaded PDF; 413 if it exceeds the extractor's size limit."""
+    max_bytes = get_pdf_extractor().max_bytes
+    digest, size = await asyncio.to_thread(_hash_file, upload.file, max_bytes)
+    if digest is None:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{upload.filename or 'Upload'} exceeds {max_bytes / 2**20:.1f} MB",
+        )
+    return PdfUpload(upload.file, digest, size, upload.filename or "")
@@ -0,0 +1,316 @@
+import time
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.tools.inverted_index import tokenize
+
+# Any callable mapping a batch of texts to a (len(texts), dim) float32 matrix
+EmbeddingFunction = Callable[[List[str]], np.ndarray]
+
+
+class HashedNgramEmbedder:
+    """
+    Deterministic, offline embedder.
+
+    Word unigrams and character n-grams are hashed (CRC32, so the output is
+    stable across processes) into a fixed number of signed buckets and the
+    result is L2-normalised. No model download or API key is needed.
+    """
+
+    def __init__(self, dim: int = 256, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        min_n, max_n = self.ngram_range
+        for token in tokenize(text):
+            features.append(token)
+            padded = f" {token} "
+            for n in range(min_n, max_n + 1):
+                for i in range(len(padded) - n + 1):
+                    features.append(padded[i:i + n])
+        return features
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+_embedding_function: EmbeddingFunction = HashedNgramEmbedder()
+
+
+def get_embedding_function() -> EmbeddingFunction:
+    return _embedding_function
+
+
+def set_embedding_function(fn: EmbeddingFunction) -> None:
+    """Swap the embedder used for newly created collections."""
+    global _embedding_function
+    _embedding_function = fn
+
+
+# Storage precisions for collection vectors. int8 rows carry a per-vector
+# float32 scale so scores are still cosines of the quantized direction.
+PRECISIONS = ("float32", "float16", "int8")
+_STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Rows upcast to float32 per block when scoring a quantized matrix
+_SCORE_BLOCK = 65536
+
+
+def storage_dtype(precision: str) -> np.dtype:
+    if precision not in _STORAGE_DTYPES:
+        raise ValueError(f"Unknown vector precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+    return np.dtype(_STORAGE_DTYPES[precision])
+
+
+def quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Encode L2-normalised float32 rows at ``precision``. For int8 each row is
+    scaled so its largest component maps to 127, and the returned scale is
+    the inverse norm of the int8 row.
+    """
+    if precision == "int8":
+        peaks = np.abs(vectors).max(axis=1, keepdims=True)
+        codes = np.zeros(vectors.shape, dtype=np.float32)
+        np.divide(vectors * 127.0, peaks, out=codes, where=peaks > 0)
+        codes = np.rint(codes).astype(np.int8)
+        norms = np.linalg.norm(codes.astype(np.float32), axis=1)
+        scales = np.zeros(len(codes), dtype=np.float32)
+        np.divide(1.0, norms, out=scales, where=norms > 0)
+        return codes, scales
+    return vectors.astype(storage_dtype(precision), copy=False), None
+
+
+class VectorIndex:
+    """
+    Exact cosine search over a contiguous row matrix.
+
+    Rows are L2-normalised on insert so cosine similarity is a single
+    matrix-vector product. Capacity doubles when full, which keeps appends
+    amortised O(1) per row.
+
+    ``precision`` sets how rows are stored: float32, float16 (half the
+    memory) or int8 with a per-vector scale (a quarter). Quantized rows are
+    upcast block by block while scoring, so the full float32 matrix never
+    exists in memory.
+    """
+
+    MIN_CAPACITY = 64
+
+    def __init__(self, dim: Optional[int] = None, precision: str = "float32"):
+        self.dim = dim
+        self.precision = precision
+        self.dtype = storage_dtype(precision)
+        self._size = 0
+        self._matrix = np.empty((0, dim or 0), dtype=self.dtype)
+        self._scales = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._matrix.shape[0]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """
+        Stored rows in their storage dtype. Row directions are exact for
+        every precision; int8 magnitudes need ``scales``.
+        """
+        return self._matrix[:self._size]
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self._scales[:self._size] if self.precision == "int8" else None
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.dim * self.dtype.itemsize + (4 if self.precision == "int8" else 0)
+
+    def memory_bytes(self) -> int:
+        return self._size * self.bytes_per_vector if self.dim else 0
+
+    def _grow(self, required: int) -> None:
+        capacity = max(self.capacity, self.MIN_CAPACITY)
+        while capacity < required:
+            capacity *= 2
+        matrix = np.empty((capacity, self.dim), dtype=self.dtype)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        if self.precision == "int8":
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._scales = scales
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Append a batch of row vectors."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._matrix = np.empty((0, self.dim), dtype=self.dtype)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        end = self._size + len(vectors)
+        if end > self.capacity:
+            self._grow(end)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        normalized = np.zeros_like(vectors)
+        np.divide(vectors, norms, out=normalized, where=norms > 0)
+        codes, scales = quantize(normalized, self.precision)
+        self._matrix[self._size:end] = codes
+        if scales is not None:
+            self._scales[self._size:end] = scales
+        self._size = end
+
+    @staticmethod
+    def _normalize_query(query_vector: np.ndarray) -> Optional[np.ndarray]:
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else None
+
+    def _score_block(self, block: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        if self.precision == "float32":
+            return block @ query
+        scores = block.astype(np.float32) @ query
+        return scores * scales if scales is not None else scores
+
+    def score_rows(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine scores of a normalised query against all rows or a subset."""
+        scales = self.scales
+        if rows is not None:
+            return self._score_block(self._matrix[rows], scales[rows] if scales is not None else None, query)
+        if self.precision == "float32":
+            return self.vectors @ query
+
+        scores = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, _SCORE_BLOCK):
+            stop = min(start + _SCORE_BLOCK, self._size)
+            block_scales = scales[start:stop] if scales is not None else None
+            scores[start:stop] = self._score_block(self._matrix[start:stop], block_scales, query)
+        return scores
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None,
+        exclude: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Return the k most similar (row, cosine) pairs, best first,
+        optionally restricted to candidate ``rows`` and skipping the
+        (sorted) ``exclude`` rows.
+        """
+        if self._size == 0 or k <= 0:
+            return []
+        query = self._normalize_query(query_vector)
+        if query is None:
+            return []
+
+        if exclude is not None and len(exclude) and rows is None:
+            rows = np.setdiff1d(np.arange(self._size), exclude, assume_unique=True)
+        elif exclude is not None and len(exclude):
+            rows = rows[~np.isin(rows, exclude, assume_unique=True)]
+
+        scores = self.score_rows(query, rows)
+        if len(scores) == 0:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = top if rows is None else rows[top]
+        return [(int(row), float(score)) for row, score in zip(ids, scores[top])]
+
+
+def rerank_exact(
+    candidates: List[Tuple[int, float]],
+    query_vector: np.ndarray,
+    full_vectors: np.ndarray,
+    k: int,
+) -> List[Tuple[int, float]]:
+    """
+    Re-score quantized search candidates against their full-precision
+    vectors (``full_vectors[i]`` belongs to ``candidates[i]``) and keep the
+    best ``k``.
+    """
+    if not candidates:
+        return []
+    query = VectorIndex._normalize_query(query_vector)
+    if query is None:
+        return candidates[:k]
+    full = np.asarray(full_vectors, dtype=np.float32)
+    norms = np.linalg.norm(full, axis=1)
+    scores = np.zeros(len(full), dtype=np.float32)
+    np.divide(full @ query, norms, out=scores, where=norms > 0)
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [(candidates[i][0], float(scores[i])) for i in order]
+
+
+def benchmark_precision(
+    reference: np.ndarray,
+    k: int = 10,
+    n_queries: int = 100,
+    rerank_factor: int = 4,
+    seed: int = 0,
+) -> dict:
+    """
+    Memory and recall@k of each storage precision on a float32
+    ``reference`` matrix, with exact float32 search as ground truth. Queries
+    are perturbed reference rows; re-ranked recall re-scores the top
+    ``k * rerank_factor`` quantized hits at full precision.
+    """
+    rng = np.random.default_rng(seed)
+    reference = np.asarray(reference, dtype=np.float32)
+    if len(reference) == 0:
+        return {"k": k, "queries": 0, "results": []}
+
+    query_rows = rng.choice(len(reference), size=min(n_queries, len(reference)), replace=False)
+    queries = reference[query_rows] + rng.normal(scale=0.01, size=(len(query_rows), reference.shape[1])).astype(np.float32)
+
+    results = []
+    truth = None
+    for precision in PRECISIONS:
+        index = VectorIndex(reference.shape[1], precision)
+        index.add(reference)
+
+        start = time.perf_counter()
+        found = [index.search(q, k * rerank_factor) for q in queries]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        if truth is None:
+            truth = [{row for row, _ in hits[:k]} for hits in found]
+
+        reranked = [
+            rerank_exact(hits, q, reference[[row for row, _ in hits]], k)
+            for q, hits in zip(queries, found)
+        ]
+        total = sum(len(t) for t in truth)
+        results.append({
+            "precision": precision,
+            "bytes_per_vector": index.bytes_per_vector,
+            "memory_mb": round(index.memory_bytes() / 2**20, 3),
+            "recall_at_k": round(sum(len(t & {row for row, _ in hits[:k]}) for t, hits in zip(truth, found)) / total, 4),
+            "recall_at_k_reranked": round(sum(len(t & {row for row, _ in hits}) for t, hits in zip(truth, reranked)) / total, 4),
+            "avg_latency_ms": round(elapsed_ms, 3),
+        })
+
+    return {
+        "k": k,
+        "queries": len(queries),
+        "rows": len(reference),
+        "dim": reference.shape[1],
+        "rerank_candidates": k * rerank_factor,
+        "results": results,
+    }
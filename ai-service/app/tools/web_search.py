@@ -1,14 +1,22 @@
 from typing import List
+import asyncio
 import os
 
 from app.models import Resource
 from app.config import settings
+from app.tools.single_flight import get_single_flight
 
 
 async def search_learning_resources(skill: str) -> List[Resource]:
     """
     Search for learning resources using Tavily or fallback to curated list.
+
+    Concurrent searches for the same skill share one Tavily request.
     """
+    return await get_single_flight("search").do(skill, lambda: _search_learning_resources(skill))
+
+
+async def _search_learning_resources(skill: str) -> List[Resource]:
     try:
         # Try Tavily search if API key available
         if settings.tavily_api_key:
@@ -16,7 +24,9 @@ async def search_learning_resources(skill: str) -> List[Resource]:
             
             client = TavilyClient(api_key=settings.tavily_api_key)
             
-            response = client.search(
+            # The Tavily client is synchronous; keep it off the event loop
+            response = await asyncio.to_thread(
+                client.search,
                 query=f"best {skill} tutorial course for developers",
                 search_depth="advanced",
                 max_results=5
@@ -0,0 +1,84 @@
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from app.config import settings
+from app.tools.extraction_cache import ExtractionCache
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+# Path prefixes followed by the video ID, e.g. /shorts/<id>
+_ID_PATH_PREFIXES = ("shorts", "embed", "v", "live", "e")
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Video ID from any common YouTube URL form: watch?v=, youtu.be/,
+    /shorts/, /embed/, /live/ and /v/ paths, on www., m., music. and
+    youtube-nocookie.com hosts. Returns None for anything else.
+    """
+    if "://" not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    segments = [segment for segment in parts.path.split("/") if segment]
+
+    candidate = None
+    if host == "youtu.be" and segments:
+        candidate = segments[0]
+    elif host in _YOUTUBE_HOSTS:
+        if segments[:1] == ["watch"]:
+            candidate = parse_qs(parts.query).get("v", [None])[0]
+        elif len(segments) >= 2 and segments[0] in _ID_PATH_PREFIXES:
+            candidate = segments[1]
+    return candidate if candidate and _VIDEO_ID_RE.match(candidate) else None
+
+
+# Transcript fetches are blocking HTTP calls; they get their own small
+# pool so a slow video cannot starve asyncio.to_thread users
+_executor = ThreadPoolExecutor(max_workers=settings.youtube_workers, thread_name_prefix="youtube")
+
+_cache: Optional[ExtractionCache] = None
+
+
+def get_transcript_cache() -> ExtractionCache:
+    global _cache
+    if _cache is None:
+        _cache = ExtractionCache(settings.transcript_cache_dir, settings.extraction_cache_size)
+    return _cache
+
+
+def _fetch_transcript(video_id: str) -> str:
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    transcript = YouTubeTranscriptApi.get_transcript(video_id)
+    return " ".join([entry["text"] for entry in transcript])
+
+
+async def get_transcript(video_id: str) -> str:
+    """
+    Transcript text for a video, from the persistent cache while younger
+    than settings.transcript_cache_ttl_seconds, otherwise fetched on the
+    transcript pool within settings.youtube_timeout_seconds.
+    """
+    cache = get_transcript_cache()
+    entry = await cache.get(video_id)
+    if entry.get("text") is not None and time.time() - entry["fetched_at"] < settings.transcript_cache_ttl_seconds:
+        return entry["text"]
+
+    loop = asyncio.get_running_loop()
+    try:
+        text = await asyncio.wait_for(
+            loop.run_in_executor(_executor, _fetch_transcript, video_id),
+            settings.youtube_timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"transcript fetch timed out after {settings.youtube_timeout_seconds:g}s")
+
+    await cache.update(video_id, text=text, fetched_at=time.time())
+    return text